@@ -75,6 +75,8 @@
 #libraries used
 import pandas as pd
 import matplotlib.pyplot as plt
+from cost_of_living import DEFAULT_FORMULA, disposable_income, partition_by_quality
+from cost_of_living.validation import non_numeric_columns as find_non_numeric_columns
 import warnings
 warnings.filterwarnings("ignore")
 
@@ -100,24 +102,28 @@ table
 
 
 #Sort data by quality as determined by numbeo
+#partition_by_quality splits df in one pass, each partition is a separate copy rather than a slice of df
+#null_policy="drop" leaves out the rows with missing values (removed in 2.2.3 anyway) without copying them,
+#the null checks of 2.2.2 use the missing values per column it counts on the way
 df = pd.read_csv('Cost_of_living_v2.csv')
-dataGoodMain = df.loc[df['data_quality']==1]
-dataBadMain = df.loc[df['data_quality']==0]
+partitions = partition_by_quality(df, null_policy="drop")
+dataGoodMain = partitions[1].frame
+dataBadMain = partitions[0].frame
 
 
 # In[4]:
 
 
-dataGoodAll = dataGoodMain
-dataGoodAll.shape
+dataGoodAll = partitions[1]
+dataGoodAll.shape_in
 #Number of entries with data quality of 1
 
 
 # In[5]:
 
 
-dataBadAll = dataBadMain
-dataBadAll.shape
+dataBadAll = partitions[0]
+dataBadAll.shape_in
 #Number of entries with data quality of 0
 
 
@@ -125,9 +131,8 @@ dataBadAll.shape
 
 
 #Remove last column of data as it is no longer required
-#dataGoodMain will be working data set and dataGoodAll will remain with all values
-dataGoodMain.drop("data_quality", inplace = True, axis = 1)
-dataBadMain.drop("data_quality", inplace = True, axis = 1)
+#partition_by_quality has already left it out of dataGoodMain and dataBadMain, df still has all values
+assert "data_quality" not in dataGoodMain.columns and "data_quality" not in dataBadMain.columns
 
 
 # The column data_quality is no longer necessary as the data has been sorted. Now the data consists of the city, country and only numeric values which represents different cost of living factors and the average monthly salary.
@@ -137,19 +142,15 @@ dataBadMain.drop("data_quality", inplace = True, axis = 1)
 # #### 2.2.1 Checking for numeric data
 
 # To check if all the data in the dataset has no non-numerical data, the code below will check and print out the columns that include non-numerical data.
-# The is_numeric function converts the value into float and returns True and inputs it into the applymap() function. The function checks all columns in the dataset and returns the header of the columns with a False return. This will ensure that the data we use for plotting and analysis does not contain illegal data.
+# The is_numeric function converts the value into float and returns True if it succeeds. Calling it on every cell with applymap() is slow on large data, so find_non_numeric_columns checks each column as a whole: numeric columns pass from their dtype, the others are converted with to_numeric() and only the values it rejects are checked with is_numeric. It returns the header of the columns with any value that cannot be converted. This will ensure that the data we use for plotting and analysis does not contain illegal data.
 
 # In[7]:
 
 
-def is_numeric(value):
-    try:
-        float(value)
-        return True
-    except ValueError:
-        return False
-    
-non_numeric_columns = dataGoodMain.columns[~dataGoodMain.applymap(is_numeric).all(0)]
+#is_numeric is kept in cost_of_living/validation.py as the per-value reference
+#non_numeric_columns checks whole columns at once and gives the same result as applymap(is_numeric)
+#dataGoodMain only holds complete rows, so every row of df is checked (data_quality is numeric as well)
+non_numeric_columns = find_non_numeric_columns(df)
 
 print(non_numeric_columns)
 
@@ -167,7 +168,8 @@ print(non_numeric_columns)
 # In[8]:
 
 
-dataBadMain.isnull().sum().sort_values(ascending=False)[0:5]
+#null_counts is dataBadMain.isnull().sum() from before the rows with missing values were left out
+dataBadAll.null_counts.sort_values(ascending=False)[0:5]
 
 
 # The top 5 columns with null entries are Tennis Court Rent(1 Hour on Weekend) (USD) (x40), Price per Square Meter to Buy Apartment Outside of Centre (USD) (x53), Price per Square Meter to Buy Apartment in City Centre (USD) (x52), Monthly Pass (Regular Price) (USD) (x29) and International Primary School, Yearly for 1 Child (USD) (x43).
@@ -180,14 +182,14 @@ dataBadMain.isnull().sum().sort_values(ascending=False)[0:5]
 # In[9]:
 
 
-null_columns = dataGoodMain.columns[dataGoodMain.isnull().any()]
+null_columns = dataGoodAll.null_counts.index[dataGoodAll.null_counts > 0]
 print(null_columns)
 
 
 # In[10]:
 
 
-null_columns = dataBadMain.columns[dataBadMain.isnull().any()]
+null_columns = dataBadAll.null_counts.index[dataBadAll.null_counts > 0]
 print(null_columns)
 
 
@@ -198,14 +200,17 @@ print(null_columns)
 # In[11]:
 
 
-dataGoodMain.dropna(inplace=True)
+#partition_by_quality already left out the rows with missing values, dropna() returns the partition as it is
+partitions[1] = partitions[1].dropna()
+dataGoodMain = partitions[1].frame
 dataGoodMain.shape
 
 
 # In[12]:
 
 
-dataBadMain.dropna(inplace=True)
+partitions[0] = partitions[0].dropna()
+dataBadMain = partitions[0].frame
 dataBadMain.shape
 
 
@@ -409,12 +414,10 @@ plt.show()
 
 
 #calculate the cost of living
-def calculate_cost(row):
-    return row['x54'] - row['x48'] - row['x36'] - row['x1']*60
-
+#DEFAULT_FORMULA is x54 - x48 - x36 - x1*60, evaluated column by column
 dataCost = dataGoodMain
 #add a new column called disposable_income
-dataCost['disposable_income'] = dataCost.apply(calculate_cost,axis=1)
+dataCost['disposable_income'] = disposable_income(dataCost, DEFAULT_FORMULA)
 dataCost['disposable_income'].describe()
 
 
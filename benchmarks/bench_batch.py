@@ -0,0 +1,41 @@
+"""Scaling of run_batch with the number of worker processes.
+
+    python -m benchmarks.bench_batch [--snapshots 32] [--rows 4500] [--workers 1 2 4 8]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from cost_of_living.batch import run_batch
+from cost_of_living.synthetic import generate_cost_of_living
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--snapshots", type=int, default=32)
+    parser.add_argument("--rows", type=int, default=4500)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp()
+    try:
+        for i in range(args.snapshots):
+            generate_cost_of_living(args.rows, seed=i).to_csv(os.path.join(tmp, "snapshot_%04d.csv" % i), index=False)
+        print("%d snapshots of %d rows, %d CPUs" % (args.snapshots, args.rows, os.cpu_count()))
+        print("%8s %10s %9s" % ("workers", "seconds", "speedup"))
+        base = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            result = run_batch(tmp, workers=workers)
+            elapsed = time.perf_counter() - start
+            assert result.errors.empty
+            base = base or elapsed
+            print("%8d %10.3f %8.2fx" % (workers, elapsed, base / elapsed))
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Row-wise apply vs column-wise disposable income.
+
+    python -m benchmarks.bench_income [--sizes 4500 100000 1000000]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from cost_of_living.income import disposable_income, disposable_income_reference
+from cost_of_living.synthetic import generate_cost_of_living
+
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[4500, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print("%10s %12s %12s %9s" % ("rows", "apply (s)", "vector (s)", "speedup"))
+    for n in args.sizes:
+        frame = generate_cost_of_living(n)
+        # apply is slow enough that one run is plenty at the larger sizes
+        t_apply, expected = best_of(lambda: disposable_income_reference(frame), 1 if n > 10_000 else args.repeat)
+        t_vec, result = best_of(lambda: disposable_income(frame), args.repeat)
+        assert np.array_equal(expected.to_numpy(dtype="float64"), result.to_numpy(), equal_nan=True)
+        print("%10d %12.4f %12.4f %8.0fx" % (n, t_apply, t_vec, t_apply / t_vec))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Plain read_csv vs the typed loader (cold and warm cache): time and peak RSS.
+
+    python -m benchmarks.bench_loader [--rows 4500] [--csv Cost_of_living_v2.csv]
+
+Each measurement runs in a fresh interpreter so peak RSS is not shared.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from cost_of_living.loader import load_cost_of_living, load_schema
+from cost_of_living.synthetic import generate_cost_of_living, write_table_csv
+
+
+def _worker(mode, csv, table):
+    start = time.perf_counter()
+    if mode == "read_csv":
+        frame = pd.read_csv(csv)
+    else:
+        frame = load_cost_of_living(csv, schema=load_schema(table))
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"seconds": elapsed, "peak_rss_mb": peak_rss_mb(),
+                      "frame_mb": frame.memory_usage(deep=True).sum() / 2**20}))
+
+
+def peak_rss_mb():
+    #VmHWM starts afresh in the new interpreter, ru_maxrss survives exec on Linux
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(mode, csv, table):
+    out = subprocess.run([sys.executable, "-m", "benchmarks.bench_loader", "--worker", mode,
+                          "--csv", csv, "--table", table],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=4500)
+    parser.add_argument("--csv", help="existing CSV to use instead of random data")
+    parser.add_argument("--table", default="Table.csv")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        return _worker(args.worker, args.csv, args.table)
+
+    tmp = tempfile.mkdtemp()
+    try:
+        csv, table = args.csv, args.table
+        if csv is None:
+            csv = os.path.join(tmp, "Cost_of_living_v2.csv")
+            generate_cost_of_living(args.rows).to_csv(csv, index=False)
+            table = os.path.join(tmp, "Table.csv")
+            write_table_csv(table)
+        shutil.rmtree(csv + ".cache", ignore_errors=True)
+
+        print("%-10s %10s %14s %10s" % ("mode", "seconds", "peak RSS (MB)", "frame (MB)"))
+        for mode in ("read_csv", "cold", "warm"):
+            result = measure("read_csv" if mode == "read_csv" else "typed", csv, table)
+            print("%-10s %10.4f %14.1f %10.2f" % (mode, result["seconds"], result["peak_rss_mb"],
+                                                 result["frame_mb"]))
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
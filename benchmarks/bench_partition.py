@@ -0,0 +1,69 @@
+"""Peak memory of the cleaning stage: notebook steps vs the DataProg sequence.
+
+    python -m benchmarks.bench_partition [--rows 4500]
+"""
+import argparse
+import time
+import tracemalloc
+import warnings
+
+from cost_of_living.partition import partition_by_quality
+from cost_of_living.synthetic import generate_cost_of_living
+
+
+def notebook_cleaning(df):
+    #sections 2.3, 2.2.2 and 2.2.3 as first written in the notebook
+    dataGoodMain = df.loc[df['data_quality'] == 1]
+    dataBadMain = df.loc[df['data_quality'] == 0]
+    dataGoodMain.drop("data_quality", inplace=True, axis=1)
+    dataBadMain.drop("data_quality", inplace=True, axis=1)
+    ranking = dataBadMain.isnull().sum().sort_values(ascending=False)[0:5]
+    good_nulls = dataGoodMain.columns[dataGoodMain.isnull().any()]
+    bad_nulls = dataBadMain.columns[dataBadMain.isnull().any()]
+    dataGoodMain.dropna(inplace=True)
+    dataBadMain.dropna(inplace=True)
+    return dataGoodMain, dataBadMain, ranking, good_nulls, bad_nulls
+
+
+def partitioned_cleaning(df):
+    #the same sections as DataProg runs them now
+    partitions = partition_by_quality(df, null_policy="drop")
+    good, bad = partitions[1], partitions[0]
+    ranking = bad.null_counts.sort_values(ascending=False)[0:5]
+    good_nulls = good.null_counts.index[good.null_counts > 0]
+    bad_nulls = bad.null_counts.index[bad.null_counts > 0]
+    good, bad = good.dropna(), bad.dropna()
+    return good.frame, bad.frame, ranking, good_nulls, bad_nulls
+
+
+def measure(func, df):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(df)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=4500)
+    args = parser.parse_args(argv)
+
+    df = generate_cost_of_living(args.rows)
+
+    print("frame: %.1f MB" % (df.memory_usage(deep=True).sum() / 2**20))
+    print("%-12s %10s %14s" % ("version", "seconds", "peak alloc (MB)"))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        results = {}
+        for name, func in (("notebook", notebook_cleaning), ("partition", partitioned_cleaning)):
+            elapsed, peak, results[name] = measure(func, df.copy())
+            print("%-12s %10.4f %14.1f" % (name, elapsed, peak / 2**20))
+    for expected, got in zip(results["notebook"], results["partition"]):
+        assert expected.equals(got), (expected, got)
+
+
+if __name__ == "__main__":
+    main()
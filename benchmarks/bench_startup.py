@@ -0,0 +1,92 @@
+"""Import time and end-to-end latency: DataProg.py vs ``python -m cost_of_living``.
+
+    python -m benchmarks.bench_startup [--rows 4500] [--repeat 3]
+
+Import times come from ``python -X importtime`` (cumulative microseconds of
+the top-level import). End-to-end runs use a temporary directory with a
+synthetic Cost_of_living_v2.csv and Table.csv; the notebook script runs
+with the Agg backend, the CLI prints only the disposable income ranking,
+first with empty caches ("cold"), then reusing them ("warm").
+"""
+import argparse
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from cost_of_living.synthetic import generate_cost_of_living, write_table_csv
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORTS = {
+    "cost_of_living": "import cost_of_living",
+    "cost_of_living.cli": "import cost_of_living.cli",
+    "DataProg imports": "import pandas, matplotlib.pyplot",
+}
+
+
+def _env():
+    env = dict(os.environ, MPLBACKEND="Agg")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+    return env
+
+
+def import_time_ms(statement):
+    """Cumulative import time of ``statement``'s top-level modules, in ms."""
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], env=_env(),
+                         check=True, capture_output=True, text=True).stderr
+    total = 0
+    for line in err.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\S.*)$", line)
+        #top-level imports are the ones printed without indentation
+        if match and not match.group(2).startswith(" "):
+            total += int(match.group(1))
+    return total / 1000
+
+
+def wall_time(command, cwd):
+    start = time.perf_counter()
+    subprocess.run(command, cwd=cwd, env=_env(), check=True, stdout=subprocess.DEVNULL,
+                   stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=4500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print("%-20s %12s" % ("import", "median (ms)"))
+    for name, statement in IMPORTS.items():
+        times = [import_time_ms(statement) for _ in range(args.repeat)]
+        print("%-20s %12.1f" % (name, statistics.median(times)))
+
+    tmp = tempfile.mkdtemp()
+    try:
+        generate_cost_of_living(args.rows).to_csv(os.path.join(tmp, "Cost_of_living_v2.csv"),
+                                                  index=False)
+        write_table_csv(os.path.join(tmp, "Table.csv"))
+        cli = [sys.executable, "-m", "cost_of_living", "--analysis", "income_ranking"]
+        runs = {"DataProg.py": [], "cli cold": [], "cli warm": []}
+        for _ in range(args.repeat):
+            runs["DataProg.py"].append(wall_time([sys.executable, os.path.join(ROOT, "DataProg.py")],
+                                                 tmp))
+            shutil.rmtree(os.path.join(tmp, ".result_cache"), ignore_errors=True)
+            shutil.rmtree(os.path.join(tmp, "Cost_of_living_v2.csv.cache"), ignore_errors=True)
+            runs["cli cold"].append(wall_time(cli, tmp))
+            runs["cli warm"].append(wall_time(cli, tmp))
+        print()
+        print("%-20s %12s" % ("end to end", "median (s)"))
+        for name, times in runs.items():
+            print("%-20s %12.3f" % (name, statistics.median(times)))
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""correlate() on the full x1..x55 matrix vs one pandas call per column pair.
+
+    python -m benchmarks.bench_stats [--rows 4500] [--bootstrap 1000]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from cost_of_living.stats import correlate, cost_columns
+from cost_of_living.synthetic import generate_cost_of_living
+
+
+def per_pair(frame, target="x54"):
+    #the straightforward version: one pandas call per column and method
+    out = {}
+    for col in cost_columns(frame, exclude=(target,)):
+        pair = frame[[col, target]].dropna()
+        ranks = pair.rank()
+        out[col] = (pair[col].corr(pair[target]), ranks[col].corr(ranks[target]))
+    return out
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=4500)
+    parser.add_argument("--bootstrap", type=int, default=1000)
+    parser.add_argument("--null-rate", type=float, default=0.0,
+                        help="extra share of missing values added to every x column")
+    args = parser.parse_args(argv)
+
+    frame = generate_cost_of_living(args.rows)
+    rng = np.random.default_rng(1)
+    for col in cost_columns(frame):
+        frame.loc[rng.random(len(frame)) < args.null_rate, col] = np.nan
+
+    t_pairs, expected = timed(lambda: per_pair(frame))
+    t_matrix, result = timed(lambda: correlate(frame))
+    t_boot, _ = timed(lambda: correlate(frame, bootstrap=args.bootstrap))
+    for col, (pearson, spearman) in expected.items():
+        assert np.isclose(result.loc[col, "pearson"], pearson)
+        assert np.isclose(result.loc[col, "spearman"], spearman)
+    print("%d rows x %d columns" % (len(frame), len(expected)))
+    print("per pair (pandas corr)        %8.4f s" % t_pairs)
+    print("correlate()                   %8.4f s" % t_matrix)
+    print("correlate(bootstrap=%-5d)    %8.4f s" % (args.bootstrap, t_boot))
+
+
+if __name__ == "__main__":
+    main()
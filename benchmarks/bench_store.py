@@ -0,0 +1,100 @@
+"""read_csv vs the typed loader vs the memory-mapped store: open time, scan time, peak RSS.
+
+    python -m benchmarks.bench_store [--rows 1000000] [--csv Cost_of_living_v2.csv]
+
+"open" is the time to get a frame of every column, "scan" the time to sum
+the x columns of the data_quality == 1 rows. Each mode runs in a fresh
+interpreter so peak RSS is not shared.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_loader import peak_rss_mb
+from cost_of_living.loader import load_cost_of_living, load_schema
+from cost_of_living.store import ColumnStore
+from cost_of_living.synthetic import generate_cost_of_living, write_table_csv
+
+MODES = ("read_csv", "loader", "store")
+
+
+def _open(mode, csv, table, store):
+    if mode == "read_csv":
+        return pd.read_csv(csv)
+    if mode == "loader":
+        return load_cost_of_living(csv, columns="all", schema=load_schema(table))
+    return ColumnStore(store).frame(quality=1)
+
+
+def _worker(mode, csv, table, store):
+    start = time.perf_counter()
+    frame = _open(mode, csv, table, store)
+    opened = time.perf_counter() - start
+    start = time.perf_counter()
+    if mode != "store":
+        frame = frame[frame["data_quality"] == 1]
+    columns = [col for col in frame.columns if col.startswith("x")]
+    total = sum(float(np.nansum(frame[col].to_numpy())) for col in columns)
+    scanned = time.perf_counter() - start
+    print(json.dumps({"open": opened, "scan": scanned, "rows": len(frame), "total": total,
+                      "peak_rss_mb": peak_rss_mb()}))
+
+
+def measure(mode, csv, table, store):
+    out = subprocess.run([sys.executable, "-m", "benchmarks.bench_store", "--worker", mode,
+                          "--csv", csv, "--table", table, "--store", store],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--csv", help="existing CSV to use instead of random data")
+    parser.add_argument("--table", default="Table.csv")
+    parser.add_argument("--store", help=argparse.SUPPRESS)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        return _worker(args.worker, args.csv, args.table, args.store)
+
+    tmp = tempfile.mkdtemp()
+    try:
+        csv, table = args.csv, args.table
+        if csv is None:
+            csv = os.path.join(tmp, "Cost_of_living_v2.csv")
+            generate_cost_of_living(args.rows).to_csv(csv, index=False)
+            table = os.path.join(tmp, "Table.csv")
+            write_table_csv(table)
+        store = os.path.join(tmp, "store")
+        start = time.perf_counter()
+        ColumnStore.from_csv(store, csv, load_schema(table))
+        print("store built in %.2f s" % (time.perf_counter() - start))
+        #warm the loader's column cache so "loader" measures a cache hit
+        shutil.rmtree(csv + ".cache", ignore_errors=True)
+        measure("loader", csv, table, store)
+
+        print("%-10s %10s %10s %14s %12s" % ("mode", "open (s)", "scan (s)", "peak RSS (MB)",
+                                           "scan (MB/s)"))
+        for mode in MODES:
+            result = measure(mode, csv, table, store)
+            megabytes = result["rows"] * 55 * 4 / 2**20
+            print("%-10s %10.4f %10.4f %14.1f %12.0f" % (mode, result["open"], result["scan"],
+                                                       result["peak_rss_mb"],
+                                                       megabytes / max(result["scan"], 1e-9)))
+        shutil.rmtree(csv + ".cache", ignore_errors=True)
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Benchmark every pipeline stage on synthetic data and track regressions.
+
+    python -m benchmarks.suite [--sizes 10000 100000 1000000 10000000]
+                               [--stages partition means ...] [--repeat 3]
+                               [--baseline benchmarks/baseline.json] [--save-baseline]
+
+Each run is saved as JSON under benchmarks/results/. With ``--baseline`` the
+run is compared with a stored one and the command exits with status 1 if
+any stage got slower than ``--threshold`` (relative) and ``--min-delta``
+(absolute seconds). ``--save-baseline`` makes this run the new baseline;
+benchmarks/baseline.json holds one recorded at 10k to 1M rows.
+
+The x columns are float64 up to 1M rows and float32 above (``--dtype``
+overrides), since the data is held twice while the stages run: 10M rows
+need about 6 GB in float32.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from cost_of_living.analysis import (MEAN_COLUMNS, column_means, country_means, income_ranking,
+                                    income_table, null_ranking)
+from cost_of_living.diff import Signature
+from cost_of_living.groups import GroupIndex
+from cost_of_living.income import DEFAULT_FORMULA, disposable_income
+from cost_of_living.joins import KeyIndex
+from cost_of_living.null_bitmap import NullBitmap
+from cost_of_living.outliers import country_z, robust_z
+from cost_of_living.partition import partition_by_quality
+from cost_of_living.scenarios import score_scenarios
+from cost_of_living.stats import correlate
+from cost_of_living.synthetic import generate_cost_of_living
+from cost_of_living.validation import non_numeric_columns
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(HERE, "results")
+BASELINE = os.path.join(HERE, "baseline.json")
+
+
+#stage name -> function of the prepared context; the order is the pipeline order
+STAGES = {
+    "read_csv": lambda ctx: pd.read_csv(ctx["csv"]),
+    "partition": lambda ctx: partition_by_quality(ctx["df"]),
+    "signature": lambda ctx: Signature.from_frame(ctx["df"]),
+    "numeric_check": lambda ctx: non_numeric_columns(ctx["partitions"][1].frame),
+    "null_ranking": lambda ctx: null_ranking(ctx["partitions"][0].frame),
+    "null_bitmap": lambda ctx: NullBitmap.from_frame(ctx["df"]),
+    "null_counts": lambda ctx: ctx["bitmap"].column_counts(ctx["df"]["data_quality"]),
+    "dropna": lambda ctx: ctx["partitions"][1].dropna(),
+    "dropna_subset": lambda ctx: ctx["partitions"][1].dropna(REQUIRED, ctx["bitmap"]),
+    "means": lambda ctx: column_means(ctx["clean"]),
+    "country_means": lambda ctx: country_means(ctx["clean"]),
+    "country_aggregate": lambda ctx: GroupIndex.from_frame(ctx["clean"]).aggregate(ctx["clean"], MEAN_COLUMNS),
+    "disposable_income": lambda ctx: disposable_income(ctx["clean"]),
+    "income_table": lambda ctx: income_table(ctx["clean"]),
+    "income_ranking": lambda ctx: income_ranking(ctx["table"]),
+    "robust_z": lambda ctx: robust_z(ctx["clean"]),
+    "country_z": lambda ctx: country_z(ctx["clean"]),
+    "correlate": lambda ctx: correlate(ctx["clean"]),
+    "country_join": lambda ctx: ctx["salaries"].join(ctx["clean"]).stats(),
+    "scenarios": lambda ctx: score_scenarios(ctx["clean"]).extremes(5),
+}
+REQUIRED = list(MEAN_COLUMNS) + DEFAULT_FORMULA.columns
+
+#above this many rows the default dtype is float32: the context holds the data
+#twice (df and its partitions), about 1.1 GB peak at 1M rows in float64
+FLOAT64_MAX_ROWS = 1_000_000
+
+
+def dtype_for(rows, dtype=None):
+    """dtype of the x columns at ``rows``: ``dtype`` if given, else float64 up to 1M rows."""
+    if dtype is not None:
+        return dtype
+    return "float64" if rows <= FLOAT64_MAX_ROWS else "float32"
+
+
+def prepare(rows, dtype):
+    df = generate_cost_of_living(rows, dtype=dtype)
+    partitions = partition_by_quality(df)
+    clean = partitions[1].dropna().frame
+    return {"df": df, "partitions": partitions, "clean": clean, "table": income_table(clean),
+            "bitmap": NullBitmap.from_frame(df), "salaries": _salary_index(df)}
+
+
+def _salary_index(df):
+    #an external per-country table spelled differently from the data, as a join target
+    names = pd.Series(df["country"].astype(object).unique()).str.upper()
+    table = pd.DataFrame({"country": names.replace({"UNITED STATES": "USA"}),
+                          "salary": np.linspace(500, 5000, len(names))})
+    return KeyIndex(table)
+
+
+def time_stage(func, ctx, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(ctx)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes, stages, repeat, dtype, max_csv_rows):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            ctx = prepare(rows, dtype_for(rows, dtype))
+            for name in stages:
+                if name == "read_csv":
+                    if rows > max_csv_rows:
+                        continue
+                    ctx["csv"] = os.path.join(tmp, "snapshot.csv")
+                    ctx["df"].to_csv(ctx["csv"], index=False)
+                #one run is enough once a single run takes seconds
+                seconds = time_stage(STAGES[name], ctx, repeat if rows <= 1_000_000 else 1)
+                results["%s@%d" % (name, rows)] = seconds
+                print("%-20s %10d %12.4f s" % (name, rows, seconds), flush=True)
+            if "csv" in ctx:
+                os.remove(ctx.pop("csv"))
+            del ctx
+    return results
+
+
+def compare(results, baseline, threshold, min_delta):
+    """Rows of (benchmark, baseline, now, ratio, regressed) for shared keys."""
+    rows = []
+    for key, now in results.items():
+        if key not in baseline:
+            continue
+        before = baseline[key]
+        regressed = now > before * (1 + threshold) and now - before > min_delta
+        rows.append((key, before, now, now / before if before else np.inf, regressed))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--dtype", help="dtype of the x columns (default: float64 up to %d rows, "
+                        "float32 above)" % FLOAT64_MAX_ROWS)
+    parser.add_argument("--max-csv-rows", type=int, default=1_000_000,
+                        help="skip read_csv above this many rows (the CSV gets large)")
+    parser.add_argument("--baseline", help="stored run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--min-delta", type=float, default=0.005)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    #read before this run can overwrite it with --save-baseline
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    results = run(args.sizes, args.stages, args.repeat, args.dtype, args.max_csv_rows)
+    record = {
+        "meta": {
+            "time": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "dtype": {str(rows): dtype_for(rows, args.dtype) for rows in args.sizes},
+        },
+        "results": results,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, "%s.json" % record["meta"]["time"].replace(":", ""))
+    with open(path, "w") as f:
+        json.dump(record, f, indent=1)
+    print("saved", path)
+    if args.save_baseline:
+        with open(BASELINE, "w") as f:
+            json.dump(record, f, indent=1)
+        print("saved baseline", BASELINE)
+
+    if baseline is not None:
+        rows = compare(results, baseline, args.threshold, args.min_delta)
+        print("\n%-30s %10s %10s %7s" % ("benchmark", "baseline", "now", "ratio"))
+        for key, before, now, ratio, regressed in rows:
+            print("%-30s %10.4f %10.4f %6.2fx%s" % (key, before, now, ratio, "  REGRESSION" if regressed else ""))
+        if any(row[-1] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Helpers for the Global Cost of Living analysis (see DataProg.ipynb).
+
+Names are imported from their modules on first use, so ``import
+cost_of_living`` loads neither pandas nor matplotlib and reads no data.
+"""
+import importlib
+
+#public name -> module it lives in
+_EXPORTS = {
+    "DEFAULT_FORMULA": "income",
+    "IncomeFormula": "income",
+    "add_disposable_income": "income",
+    "disposable_income": "income",
+    "stack_snapshots": "income",
+    "ANALYSIS_COLUMNS": "loader",
+    "load_cost_of_living": "loader",
+    "load_schema": "loader",
+    "Partition": "partition",
+    "partition_by_quality": "partition",
+    "partition_summary": "partition",
+    "non_numeric_columns": "validation",
+    "numeric_report": "validation",
+    "RunningDescribe": "streaming",
+    "StreamResult": "streaming",
+    "TopK": "streaming",
+    "iter_clean_chunks": "streaming",
+    "stream_analysis": "streaming",
+    "KLLSketch": "streaming",
+    "AggregateIndex": "aggregate_index",
+    "BatchResult": "batch",
+    "analyse_snapshot": "batch",
+    "run_batch": "batch",
+    "ReportRenderer": "plotting",
+    "render_notebook_figures": "plotting",
+    "correlate": "stats",
+    "run_analysis": "analysis",
+    "ResultCache": "cache",
+    "fingerprint": "cache",
+    "StageProfiler": "profiling",
+    "generate_cost_of_living": "synthetic",
+    "BASKETS": "scenarios",
+    "ScenarioResult": "scenarios",
+    "score_scenarios": "scenarios",
+    "NullBitmap": "null_bitmap",
+    "ColumnStore": "store",
+    "GroupIndex": "groups",
+    "load_population": "groups",
+    "KeyIndex": "joins",
+    "compare_salaries": "joins",
+    "normalize_name": "joins",
+    "find_outliers": "outliers",
+    "robust_z": "outliers",
+    "stream_outliers": "outliers",
+    "trim": "outliers",
+    "winsorize": "outliers",
+    "Signature": "diff",
+    "SnapshotDiff": "diff",
+    "diff_csv": "diff",
+    "diff_frames": "diff",
+    "index_snapshot": "diff",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = getattr(importlib.import_module("." + module, __name__), name)
+    #later lookups find it in the module dict and skip this function
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,264 @@
+"""Incremental per-country aggregates for the notebook's summary queries.
+
+Sections 3.1.1 and 5.2 count cities per country and 3.3.2 looks for the
+cities with the lowest and highest disposable income. :class:`AggregateIndex`
+keeps those answers up to date as rows are added, changed or removed, keyed
+by ``(country, data_quality)``: row counts, per-column count/sum/sum of
+squares, and for every tracked column a sorted list of ``(value, row label)``
+giving min/max (with their city) and bottom/top k without a scan.
+"""
+import bisect
+import heapq
+import itertools
+import math
+import os
+import pickle
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from .income import DEFAULT_FORMULA, disposable_income
+
+DEFAULT_COLUMNS = ("x1", "x2", "x36", "x48", "x54", "disposable_income")
+
+
+@dataclass
+class GroupStats:
+    """Aggregates of one (country, data_quality) group."""
+
+    rows: int = 0
+    count: dict = field(default_factory=dict)
+    total: dict = field(default_factory=dict)
+    total_sq: dict = field(default_factory=dict)
+    #column -> sorted list of (value, row label), missing values left out
+    ordered: dict = field(default_factory=dict)
+    #sorted row labels, the first one breaking value_counts ties
+    labels: list = field(default_factory=list)
+
+    def mean(self, column):
+        n = self.count.get(column, 0)
+        return self.total[column] / n if n else math.nan
+
+    def std(self, column):
+        n = self.count.get(column, 0)
+        if n < 2:
+            return math.nan
+        var = (self.total_sq[column] - self.total[column] ** 2 / n) / (n - 1)
+        return math.sqrt(max(var, 0.0))
+
+
+class AggregateIndex:
+    """Aggregates keyed by ``(country, data_quality)``, updated row by row.
+
+    Rows are identified by their index label, which must be unique and
+    sortable (the default RangeIndex from ``read_csv`` is). If ``frame``
+    has no ``disposable_income`` column it is computed with ``formula``.
+    Sums are kept as running totals, so after many removals means can
+    differ from a fresh computation in the last few digits.
+    """
+
+    def __init__(self, columns=DEFAULT_COLUMNS, formula=DEFAULT_FORMULA):
+        self.columns = tuple(columns)
+        self.formula = formula
+        self.groups = {}
+        #row label -> (group key, city, tuple of values)
+        self.rows = {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, label):
+        return label in self.rows
+
+    # -- updates -------------------------------------------------------------
+
+    def add(self, frame):
+        """Add the rows of ``frame``; their labels must not be indexed yet."""
+        labels = frame.index
+        clash = [label for label in labels if label in self.rows]
+        if clash or not labels.is_unique:
+            raise ValueError("rows already indexed (use update): %r" % (clash[:5] or "duplicates",))
+        if "disposable_income" in self.columns and "disposable_income" not in frame:
+            frame = frame.assign(disposable_income=disposable_income(frame, self.formula))
+        values = np.column_stack([frame[col].to_numpy(dtype="float64") for col in self.columns])
+        cities = frame["city"].tolist()
+        keys = list(zip(frame["country"].tolist(), frame["data_quality"].tolist()))
+
+        positions = {}
+        for pos, key in enumerate(keys):
+            positions.setdefault(key, []).append(pos)
+        for key, rows in positions.items():
+            self._add_group(key, np.asarray(rows), labels, values)
+        for pos, label in enumerate(labels):
+            self.rows[label] = (keys[pos], cities[pos], tuple(values[pos]))
+        return self
+
+    def _add_group(self, key, rows, labels, values):
+        group = self.groups.setdefault(key, GroupStats())
+        group.rows += len(rows)
+        _insert(group.labels, [labels[r] for r in rows])
+        block = values[rows]
+        for j, col in enumerate(self.columns):
+            column = block[:, j]
+            valid = ~np.isnan(column)
+            group.count[col] = group.count.get(col, 0) + int(valid.sum())
+            group.total[col] = group.total.get(col, 0.0) + float(column[valid].sum())
+            group.total_sq[col] = group.total_sq.get(col, 0.0) + float((column[valid] ** 2).sum())
+            new = [(float(column[i]), labels[rows[i]]) for i in np.flatnonzero(valid)]
+            _insert(group.ordered.setdefault(col, []), new)
+
+    def remove(self, labels):
+        """Remove the rows with the given index labels (unknown labels are an error)."""
+        for label in labels:
+            key, _, values = self.rows.pop(label)
+            group = self.groups[key]
+            group.rows -= 1
+            del group.labels[bisect.bisect_left(group.labels, label)]
+            for col, value in zip(self.columns, values):
+                if math.isnan(value):
+                    continue
+                group.count[col] -= 1
+                group.total[col] -= value
+                group.total_sq[col] -= value * value
+                ordered = group.ordered[col]
+                del ordered[bisect.bisect_left(ordered, (value, label))]
+            if not group.rows:
+                del self.groups[key]
+        return self
+
+    def update(self, frame):
+        """Replace rows already indexed under the same labels, add the others."""
+        self.remove([label for label in frame.index if label in self.rows])
+        return self.add(frame)
+
+    # -- queries -------------------------------------------------------------
+
+    def _selected(self, data_quality=None, country=None):
+        return [(key, group) for key, group in self.groups.items()
+                if (data_quality is None or key[1] == data_quality)
+                and (country is None or key[0] == country)]
+
+    def value_counts(self, data_quality=None):
+        """Cities per country, largest first.
+
+        Ties go to the country whose first row has the lowest label, as
+        ``value_counts`` orders them by first appearance in a frame whose
+        rows are in label order (such as a RangeIndex from ``read_csv``).
+        """
+        counts, first = {}, {}
+        for (country, _), group in self._selected(data_quality):
+            counts[country] = counts.get(country, 0) + group.rows
+            first[country] = min(first.get(country, group.labels[0]), group.labels[0])
+        ordered = sorted(counts, key=lambda country: (-counts[country], first[country]))
+        series = pd.Series({country: counts[country] for country in ordered}, dtype="int64", name="count")
+        series.index.name = "country"
+        return series
+
+    def country_stats(self, column, data_quality=None):
+        """Count, mean, std, min and max of ``column`` per country.
+
+        ``min_city``/``max_city`` name the city holding the extreme value.
+        """
+        merged = {}
+        for (country, _), group in self._selected(data_quality):
+            merged.setdefault(country, []).append(group)
+        records = {}
+        for country, groups in merged.items():
+            n = sum(g.count.get(column, 0) for g in groups)
+            total = sum(g.total.get(column, 0.0) for g in groups)
+            total_sq = sum(g.total_sq.get(column, 0.0) for g in groups)
+            low = self._extreme(groups, column, 0)
+            high = self._extreme(groups, column, -1)
+            records[country] = {
+                "count": n,
+                "mean": total / n if n else math.nan,
+                "std": math.sqrt(max((total_sq - total ** 2 / n) / (n - 1), 0.0)) if n > 1 else math.nan,
+                "min": low[0] if low else math.nan,
+                "min_city": self.rows[low[1]][1] if low else None,
+                "max": high[0] if high else math.nan,
+                "max_city": self.rows[high[1]][1] if high else None,
+            }
+        frame = pd.DataFrame.from_dict(records, orient="index")
+        frame.index.name = "country"
+        return frame
+
+    @staticmethod
+    def _extreme(groups, column, end):
+        """Lowest (``end=0``) or highest (``end=-1``) ``(value, label)`` of the groups."""
+        items = []
+        for group in groups:
+            ordered = group.ordered.get(column)
+            if ordered:
+                #for the max, the first label among rows tied at the top
+                items.append(ordered[0] if end == 0 else ordered[bisect.bisect_left(ordered, (ordered[-1][0],))])
+        if not items:
+            return None
+        return min(items) if end == 0 else min(items, key=lambda item: (-item[0], item[1]))
+
+    def extreme(self, column, which="min", data_quality=None):
+        """Row holding the min or max of ``column`` as ``(value, label, city, country)``."""
+        rows = (self.nsmallest if which == "min" else self.nlargest)(1, column, data_quality)
+        if rows.empty:
+            return None
+        label = rows.index[0]
+        return (rows[column].iloc[0], label, rows["city"].iloc[0], rows["country"].iloc[0])
+
+    def nsmallest(self, k=5, column="disposable_income", data_quality=None, country=None):
+        """The ``k`` rows with the lowest ``column``, like ``DataFrame.nsmallest``."""
+        lists = [g.ordered.get(column, []) for _, g in self._selected(data_quality, country)]
+        items = list(itertools.islice(heapq.merge(*lists), k))
+        return self._frame(items, column)
+
+    def nlargest(self, k=5, column="disposable_income", data_quality=None, country=None):
+        """The ``k`` rows with the highest ``column``, like ``DataFrame.nlargest``."""
+        candidates = []
+        for _, group in self._selected(data_quality, country):
+            ordered = group.ordered.get(column, [])
+            if not ordered:
+                continue
+            #the last k items, plus anything tied with the k-th from the end
+            start = max(len(ordered) - k, 0)
+            start = bisect.bisect_left(ordered, (ordered[start][0],))
+            candidates.extend(ordered[start:])
+        items = heapq.nsmallest(k, candidates, key=lambda item: (-item[0], item[1]))
+        return self._frame(items, column)
+
+    def _frame(self, items, column):
+        rows = [self.rows[label] for _, label in items]
+        return pd.DataFrame(
+            {
+                "city": [row[1] for row in rows],
+                "country": [row[0][0] for row in rows],
+                column: [value for value, _ in items],
+            },
+            index=[label for _, label in items],
+        )
+
+    # -- checkpoints ---------------------------------------------------------
+
+    def save(self, path):
+        """Write the index to ``path`` (atomically, via a temporary file)."""
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as f:
+            index = pickle.load(f)
+        if not isinstance(index, AggregateIndex):
+            raise TypeError("%s does not hold an AggregateIndex" % path)
+        return index
+
+
+def _insert(ordered, new):
+    """Insert the items of ``new`` into the sorted list ``ordered``."""
+    #a big batch is cheaper to sort in than to insert one at a time
+    if len(new) > len(ordered) // 8:
+        ordered.extend(new)
+        ordered.sort()
+    else:
+        for item in new:
+            bisect.insort(ordered, item)
@@ -0,0 +1,150 @@
+"""The notebook's analysis steps as functions.
+
+Each step takes the frame it works on and its parameters and returns a
+small result, so steps can be run on their own, cached (see
+:mod:`cost_of_living.cache`) or run over many snapshots.
+"""
+import pandas as pd
+
+from .groups import GroupIndex
+from .income import DEFAULT_FORMULA, disposable_income
+from .null_bitmap import NullBitmap
+from .outliers import ROBUST
+from .partition import partition_by_quality
+from .profiling import NULL_PROFILER
+
+MEAN_COLUMNS = ("x1", "x2", "x36", "x48", "x54")
+
+#steps of run_analysis, in the order they run
+STEPS = ("null_ranking", "means", "country_means", "disposable_income", "income_ranking")
+
+
+def clean(df, quality=1, required=None, bitmap=None):
+    """Partitions of ``df`` by data_quality, and the cleaned ``quality`` rows (2.3, 2.2.3).
+
+    By default rows with any missing value are dropped, as in the notebook.
+    With ``required``, only rows missing one of those columns are dropped;
+    ``bitmap`` is a :class:`~cost_of_living.null_bitmap.NullBitmap` of
+    ``df`` to answer that from (built here if not given).
+    """
+    partitions = partition_by_quality(df)
+    if required is None:
+        return partitions, partitions[quality].dropna().frame
+    if bitmap is None:
+        bitmap = NullBitmap.from_frame(df, required)
+    return partitions, partitions[quality].dropna(list(required), bitmap).frame
+
+
+def null_ranking(frame, top=5):
+    """Columns with the most missing values (2.2.2.1)."""
+    return frame.isnull().sum().sort_values(ascending=False)[0:top]
+
+
+def column_means(frame, columns=MEAN_COLUMNS):
+    """Means of ``columns`` and the rent and basics share of salary (3.1.2, 3.2)."""
+    means = frame[list(columns)].mean()
+    means["rent_pct"] = means["x48"] / means["x54"] * 100
+    means["basic_pct"] = means["x36"] / means["x54"] * 100
+    return means
+
+
+def country_means(frame, columns=MEAN_COLUMNS, weights="equal", index=None):
+    """:func:`column_means` with countries weighted equally or by population (5.2).
+
+    ``weights`` is as for :meth:`~cost_of_living.groups.GroupIndex.group_weights`;
+    ``index`` is a :class:`~cost_of_living.groups.GroupIndex` of ``frame``
+    to reuse (built here if not given).
+    """
+    if index is None:
+        index = GroupIndex.from_frame(frame)
+    return index.stratified(frame, columns, weights, percentiles=()).loc["mean"]
+
+
+def income_table(frame, formula=DEFAULT_FORMULA):
+    """City, country and disposable income of every row (3.3.1)."""
+    table = frame[["city", "country"]].copy()
+    table["disposable_income"] = disposable_income(frame, formula)
+    return table
+
+
+def income_ranking(table, k=5):
+    """The ``k`` cities with the lowest and the highest disposable income (3.3.2)."""
+    return {"lowest": table.nsmallest(k, "disposable_income"),
+            "highest": table.nlargest(k, "disposable_income")}
+
+
+def _step(cache, name, frame, columns, params, compute):
+    if cache is None:
+        return compute()
+    return cache.get_or_compute(name, frame, columns, params, compute)
+
+
+def run_analysis(df, cache=None, quality=1, formula=DEFAULT_FORMULA, k=5, profiler=NULL_PROFILER,
+                 required=None, bitmap=None, weights=None, steps=None, robust=None,
+                 limits=(0.01, 0.99)):
+    """Run the notebook steps on ``df``, reusing cached results where possible.
+
+    ``steps`` names the results wanted (see :data:`STEPS`); by default all
+    of them, with ``country_means`` only when ``weights`` is given (it
+    defaults to ``"equal"`` when asked for by name). Steps a wanted step
+    depends on run without being returned.
+
+    ``required``/``bitmap`` are passed to :func:`clean`; the notebook's
+    global ``dropna`` is used unless ``required`` is given, e.g. as
+    ``MEAN_COLUMNS + tuple(formula.columns)``. ``robust`` (``"winsorize"``
+    or ``"trim"``, see :mod:`cost_of_living.outliers`) runs the means and
+    disposable income steps on the cleaned rows with the columns they read
+    clipped to, or rows outside of, their ``limits`` quantiles.
+
+    With a :class:`~cost_of_living.cache.ResultCache`, each step is keyed on
+    the columns it reads and its parameters, so only steps whose input
+    changed are computed again. Each step runs as a stage of ``profiler``
+    (a :class:`~cost_of_living.profiling.StageProfiler`).
+    """
+    if steps is None:
+        steps = [step for step in STEPS if step != "country_means" or weights is not None]
+    unknown = set(steps) - set(STEPS)
+    if unknown:
+        raise ValueError("unknown steps: %s" % ", ".join(sorted(unknown)))
+    if "country_means" in steps and weights is None:
+        weights = "equal"
+    with profiler.stage("clean", df) as stage:
+        partitions, good = clean(df, quality, required, bitmap)
+        stage.output(good)
+    if robust is not None:
+        columns = list(dict.fromkeys(MEAN_COLUMNS + tuple(formula.columns)))
+        with profiler.stage(robust, good) as stage:
+            good = stage.output(ROBUST[robust](good, columns, limits))
+    bad = partitions[1 - quality].frame if (1 - quality) in partitions else None
+    results = {}
+    if bad is not None and "null_ranking" in steps:
+        with profiler.stage("null_ranking", bad) as stage:
+            results["null_ranking"] = stage.output(
+                _step(cache, "null_ranking", bad, None, {"top": 5}, lambda: null_ranking(bad)))
+    if "means" in steps:
+        with profiler.stage("means", good) as stage:
+            results["means"] = stage.output(
+                _step(cache, "means", good, MEAN_COLUMNS, {"quality": quality}, lambda: column_means(good)))
+    if "country_means" in steps:
+        columns = ["country"] + list(MEAN_COLUMNS)
+        #a population table goes into the key in full, not as a truncated repr
+        key = weights if isinstance(weights, str) else pd.Series(weights, dtype="float64").to_dict()
+        with profiler.stage("country_means", good) as stage:
+            results["country_means"] = stage.output(
+                _step(cache, "country_means", good, columns, {"quality": quality, "weights": key},
+                      lambda: country_means(good, weights=weights)))
+    if "disposable_income" not in steps and "income_ranking" not in steps:
+        return results
+    columns = ["city", "country"] + formula.columns
+    with profiler.stage("disposable_income", good) as stage:
+        table = stage.output(
+            _step(cache, "disposable_income", good, columns, {"quality": quality, "formula": formula},
+                  lambda: income_table(good, formula)))
+    if "disposable_income" in steps:
+        results["disposable_income"] = table
+    if "income_ranking" in steps:
+        with profiler.stage("income_ranking", table) as stage:
+            results["income_ranking"] = _step(cache, "income_ranking", table, None, {"k": k},
+                                              lambda: income_ranking(table, k))
+            stage.output(results["income_ranking"]["lowest"])
+    return results
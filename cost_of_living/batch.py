@@ -0,0 +1,163 @@
+"""Run the DataProg analysis over many snapshot CSVs with a process pool.
+
+Each worker loads one snapshot, runs the notebook analysis on it and sends
+back a small dict of scalars and NumPy arrays (a few hundred bytes to a few
+KB pickled) rather than DataFrames. The parent merges them, in input order,
+into tidy tables. A failing snapshot is recorded as an error and does not
+stop the others.
+"""
+import glob
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .analysis import MEAN_COLUMNS, column_means
+from .income import DEFAULT_FORMULA, disposable_income
+from .partition import partition_by_quality
+
+
+def expand_paths(spec):
+    """Snapshot paths from a directory, a glob pattern or a list of paths.
+
+    Directories and patterns are expanded in sorted order; an explicit list
+    keeps its order.
+    """
+    if isinstance(spec, (list, tuple)):
+        return list(spec)
+    if os.path.isdir(spec):
+        spec = os.path.join(spec, "*.csv")
+    return sorted(glob.glob(spec))
+
+
+def analyse_snapshot(path, k=5, formula=DEFAULT_FORMULA):
+    """Notebook analysis of one snapshot, as a dict of scalars and small arrays.
+
+    Covers the quality split and row counts (2.3, 2.2.3), null counts of the
+    good rows (2.2.2), the means of x1/x2/x36/x48/x54 and the rent and basics
+    to salary percentages (3.2), and the disposable income summary with the
+    ``k`` lowest and highest cities (3.3).
+    """
+    df = pd.read_csv(path)
+    partitions = partition_by_quality(df, null_policy="drop")
+    good, bad = partitions[1], partitions[0]
+    nulls = good.null_counts
+
+    frame = good.frame
+    income = disposable_income(frame, formula).to_numpy()
+    means = column_means(frame)
+    order = np.argsort(income, kind="stable")
+    lowest = order[:k]
+    #ties in the top k go to the earlier row, as in nlargest
+    highest = np.lexsort((np.arange(len(income)), -income))[:k]
+    return {
+        "rows": len(df),
+        "rows_good": good.rows_in,
+        "rows_bad": bad.rows_in,
+        "rows_good_clean": good.rows_out,
+        "rows_bad_clean": bad.rows_out,
+        "null_columns": np.asarray(nulls.index, dtype=object),
+        "null_counts": nulls.to_numpy(dtype="int64"),
+        "means": means[list(MEAN_COLUMNS)].to_numpy(dtype="float64"),
+        "rent_pct": float(means["rent_pct"]),
+        "basic_pct": float(means["basic_pct"]),
+        "income_stats": np.array([income.mean(), income.std(ddof=1), income.min(), income.max()])
+        if len(income) else np.full(4, np.nan),
+        "lowest": (frame["city"].to_numpy()[lowest], frame["country"].to_numpy()[lowest], income[lowest]),
+        "highest": (frame["city"].to_numpy()[highest], frame["country"].to_numpy()[highest], income[highest]),
+    }
+
+
+def _safe_analyse(path, kwargs):
+    #runs in the worker: turn any failure into a result so the pool keeps going
+    try:
+        return path, analyse_snapshot(path, **kwargs), None
+    except Exception:
+        return path, None, traceback.format_exc(limit=3)
+
+
+@dataclass
+class BatchResult:
+    """Merged results of :func:`run_batch`.
+
+    ``metrics`` is long-form (snapshot, metric, value), ``nulls`` has one
+    row per snapshot and column, ``rankings`` holds the lowest/highest
+    disposable income cities and ``errors`` the snapshots that failed.
+    """
+
+    metrics: pd.DataFrame
+    nulls: pd.DataFrame
+    rankings: pd.DataFrame
+    errors: pd.DataFrame
+
+    def wide(self):
+        """``metrics`` pivoted to one row per snapshot."""
+        wide = self.metrics.pivot(index="snapshot", columns="metric", values="value")
+        return wide.reindex(index=self.metrics["snapshot"].unique(),
+                            columns=self.metrics["metric"].unique())
+
+
+def run_batch(snapshots, workers=None, k=5, formula=DEFAULT_FORMULA):
+    """Analyse every snapshot in ``snapshots`` (see :func:`expand_paths`).
+
+    ``workers`` is the pool size (``None`` for one per CPU); with
+    ``workers=1`` the snapshots are analysed in this process. Results come
+    back in input order whatever order the workers finish in.
+    """
+    paths = expand_paths(snapshots)
+    kwargs = {"k": k, "formula": formula}
+    if workers == 1:
+        results = [_safe_analyse(path, kwargs) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_safe_analyse, path, kwargs) for path in paths]
+            results = []
+            for path, future in zip(paths, futures):
+                try:
+                    results.append(future.result())
+                except Exception:
+                    #the worker itself died (e.g. killed), not the analysis
+                    results.append((path, None, traceback.format_exc(limit=3)))
+    return merge_results(results)
+
+
+def merge_results(results):
+    """Combine ``(path, result, error)`` tuples into a :class:`BatchResult`."""
+    metrics, nulls, rankings, errors = [], [], [], []
+    for path, result, error in results:
+        if error is not None:
+            errors.append({"snapshot": path, "error": error})
+            continue
+        scalars = {
+            "rows": result["rows"],
+            "rows_good": result["rows_good"],
+            "rows_bad": result["rows_bad"],
+            "rows_good_clean": result["rows_good_clean"],
+            "rows_bad_clean": result["rows_bad_clean"],
+            "rent_pct": result["rent_pct"],
+            "basic_pct": result["basic_pct"],
+        }
+        scalars.update({col + "_mean": value for col, value in zip(MEAN_COLUMNS, result["means"])})
+        scalars.update({"disposable_income_" + name: value for name, value in
+                        zip(("mean", "std", "min", "max"), result["income_stats"])})
+        metrics.extend({"snapshot": path, "metric": name, "value": float(value)}
+                       for name, value in scalars.items())
+        nulls.append(pd.DataFrame({"snapshot": path, "column": result["null_columns"],
+                                   "nulls": result["null_counts"]}))
+        for kind in ("lowest", "highest"):
+            cities, countries, values = result[kind]
+            rankings.append(pd.DataFrame({"snapshot": path, "kind": kind,
+                                          "rank": np.arange(1, len(values) + 1),
+                                          "city": cities, "country": countries,
+                                          "disposable_income": values}))
+    return BatchResult(
+        metrics=pd.DataFrame(metrics, columns=["snapshot", "metric", "value"]),
+        nulls=pd.concat(nulls, ignore_index=True) if nulls else
+        pd.DataFrame(columns=["snapshot", "column", "nulls"]),
+        rankings=pd.concat(rankings, ignore_index=True) if rankings else
+        pd.DataFrame(columns=["snapshot", "kind", "rank", "city", "country", "disposable_income"]),
+        errors=pd.DataFrame(errors, columns=["snapshot", "error"]),
+    )
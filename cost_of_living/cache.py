@@ -0,0 +1,107 @@
+"""On-disk memoization of analysis steps, keyed by a fingerprint of their input.
+
+A step's key combines its name, a content hash of the input columns it
+reads (values, dtypes and index) and its parameters, such as the meal
+multiplier of the disposable income formula or the data_quality value
+analysed. Unchanged inputs give the same key, so a rerun loads the stored
+result instead of computing it. Results are pickled into one file each;
+the least recently used files are removed once the directory grows past
+``max_bytes``.
+"""
+import hashlib
+import json
+import os
+import pickle
+from collections import Counter
+
+import pandas as pd
+
+
+def fingerprint(frame, columns=None, params=None):
+    """Hex digest of ``columns`` of ``frame`` (with its index) and ``params``."""
+    columns = list(frame.columns if columns is None else columns)
+    digest = hashlib.sha1()
+    digest.update(pd.util.hash_pandas_object(frame.index).to_numpy().tobytes())
+    for col in columns:
+        digest.update(repr((col, str(frame[col].dtype))).encode())
+        digest.update(pd.util.hash_pandas_object(frame[col], index=False).to_numpy().tobytes())
+    #repr() covers parameters json cannot encode, such as an IncomeFormula
+    digest.update(json.dumps(params, sort_keys=True, default=repr).encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Directory of pickled step results with size-bounded LRU eviction.
+
+    ``hits`` and ``misses`` count lookups per step name, so a rerun on
+    unchanged data can be checked to have computed nothing.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 2**20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = Counter()
+        self.misses = Counter()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, step, key):
+        return os.path.join(self.directory, "%s-%s.pkl" % (step, key))
+
+    def get_or_compute(self, step, frame, columns, params, compute):
+        """Return the stored result of ``step`` for this input, or ``compute()`` it."""
+        path = self.path(step, fingerprint(frame, columns, params))
+        try:
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            pass
+        else:
+            self.hits[step] += 1
+            #the file's mtime doubles as its last use, for eviction
+            os.utime(path)
+            return result
+        self.misses[step] += 1
+        result = compute()
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self.evict()
+        return result
+
+    def entries(self):
+        """Stored results as (path, size, last use), oldest first."""
+        out = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".pkl"):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                out.append((path, stat.st_size, stat.st_mtime_ns))
+        return sorted(out, key=lambda entry: entry[2])
+
+    def evict(self):
+        """Remove least recently used results until the total fits ``max_bytes``."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        for path, _, _ in self.entries():
+            os.remove(path)
+
+    def report(self):
+        """Hits and misses per step."""
+        steps = sorted(set(self.hits) | set(self.misses))
+        return pd.DataFrame({"hits": [self.hits[s] for s in steps],
+                             "misses": [self.misses[s] for s in steps]},
+                            index=pd.Index(steps, name="step"))
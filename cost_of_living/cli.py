@@ -0,0 +1,119 @@
+"""Command line entry point: run selected analysis steps and print them as JSON.
+
+    python -m cost_of_living [CSV] [--analysis income_ranking ...] [--plot DIR]
+
+Only the steps asked for are computed (see :data:`~cost_of_living.analysis.STEPS`),
+results are reused from ``.result_cache`` when the data has not changed,
+and matplotlib is only imported when ``--plot`` is given. Rankings and
+tables are printed as lists of records, series as objects; missing values
+become ``null``.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+
+#analysis.STEPS, repeated so --help does not have to import pandas
+STEP_NAMES = ("null_ranking", "means", "country_means", "disposable_income", "income_ranking")
+
+
+def _scalar(value):
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def to_json(result):
+    """Plain JSON-encodable form of a step result (Series, DataFrame, dict of those)."""
+    import pandas as pd
+
+    if isinstance(result, pd.DataFrame):
+        return [{str(col): _scalar(value) for col, value in row.items()}
+                for row in result.to_dict(orient="records")]
+    if isinstance(result, pd.Series):
+        return {str(key): _scalar(value) for key, value in result.items()}
+    if isinstance(result, dict):
+        return {str(key): to_json(value) for key, value in result.items()}
+    return _scalar(result)
+
+
+def load(path, table="Table.csv", required=None, float_dtype="float64", cache=True):
+    """The snapshot at ``path``: every column, or only those the analysis and ``required`` need."""
+    import pandas as pd
+
+    from .analysis import MEAN_COLUMNS
+    from .loader import ANALYSIS_COLUMNS, load_cost_of_living, load_schema, schema_for
+
+    if os.path.exists(table):
+        schema = load_schema(table, float_dtype)
+    else:
+        schema = schema_for(pd.read_csv(path, nrows=0).columns, float_dtype)
+    columns = "all"
+    if required is not None:
+        columns = list(dict.fromkeys(ANALYSIS_COLUMNS + list(MEAN_COLUMNS) + list(required)))
+    return load_cost_of_living(path, columns, schema, cache_dir=None if cache else False)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m cost_of_living",
+                                     description=__doc__.splitlines()[0])
+    parser.add_argument("csv", nargs="?", default="Cost_of_living_v2.csv")
+    parser.add_argument("--table", default="Table.csv",
+                        help="column map used for dtypes (default: %(default)s, if present)")
+    parser.add_argument("--analysis", nargs="+", choices=STEP_NAMES, default=["income_ranking"],
+                        metavar="STEP", help="steps to output: %s (default: income_ranking)"
+                        % ", ".join(STEP_NAMES))
+    parser.add_argument("-k", type=int, default=5, help="cities at each end of the ranking")
+    parser.add_argument("--quality", type=int, default=1, help="data_quality value analysed")
+    parser.add_argument("--required", nargs="+", metavar="COLUMN",
+                        help="drop only rows missing these columns (and load only what is needed)")
+    parser.add_argument("--weights", default=None,
+                        help="country_means weighting: equal, rows or a population CSV")
+    parser.add_argument("--robust", choices=("winsorize", "trim"),
+                        help="run means and disposable income on winsorized or trimmed rows")
+    parser.add_argument("--limits", nargs=2, type=float, default=(0.01, 0.99), metavar=("LOW", "HIGH"),
+                        help="quantiles for --robust (default: 0.01 0.99)")
+    parser.add_argument("--float-dtype", default="float64")
+    parser.add_argument("--cache-dir", default=".result_cache")
+    parser.add_argument("--no-cache", action="store_true", help="ignore and write no caches")
+    parser.add_argument("--plot", metavar="DIR", help="also render the notebook figures to DIR")
+    parser.add_argument("--output", "-o", help="write the JSON here instead of stdout")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    from .analysis import run_analysis
+    from .cache import ResultCache
+
+    weights = args.weights
+    if weights not in (None, "equal", "rows"):
+        from .groups import load_population
+
+        weights = load_population(weights)
+    df = load(args.csv, args.table, args.required, args.float_dtype, cache=not args.no_cache)
+    cache = None if args.no_cache else ResultCache(args.cache_dir)
+    results = run_analysis(df, cache, args.quality, k=args.k, required=args.required,
+                           weights=weights, steps=args.analysis, robust=args.robust,
+                           limits=tuple(args.limits))
+
+    if args.plot:
+        from .analysis import clean
+        from .income import add_disposable_income
+        from .plotting import render_notebook_figures
+
+        partitions, good = clean(df, args.quality, args.required)
+        bad = partitions[1 - args.quality].frame
+        render_notebook_figures(add_disposable_income(good), bad, args.plot)
+
+    text = json.dumps(to_json(results), indent=1)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+    return 0
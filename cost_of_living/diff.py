@@ -0,0 +1,317 @@
+"""Differences between two scrapes of Cost_of_living_v2.
+
+Rows are keyed by ``(city, country)`` and summarised by a
+:class:`Signature`: a 64-bit hash of each row's key and a 64-bit
+fingerprint of its values. Two signatures are matched on their sorted keys,
+so finding the added, removed and changed cities costs 24 bytes per row
+and a sort, not a cell by cell comparison of two frames; a signature can be
+built from a CSV in chunks and saved next to it for the next scrape. Only
+the rows that differ are then loaded to report changed cells, data_quality
+flips and per-column deltas, and to update the downstream stages with
+:meth:`SnapshotDiff.apply`.
+"""
+import warnings
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .aggregate_index import DEFAULT_COLUMNS, AggregateIndex
+from .income import DEFAULT_FORMULA, disposable_income
+from .partition import partition_by_quality
+from .stats import cost_columns
+
+KEY = ("city", "country")
+
+
+def _key_hashes(frame, key):
+    parts = pd.DataFrame({col: np.asarray(frame[col], dtype=object) for col in key})
+    return pd.util.hash_pandas_object(parts, index=False).to_numpy()
+
+
+def _number_repeats(hashes):
+    #the n-th repeat (n > 0) of a key hash gets n mixed in; first occurrences keep the plain hash,
+    #so a duplicate in one snapshot does not change the keys of every other row
+    occurrence = pd.Series(hashes).groupby(hashes, sort=False).cumcount().to_numpy()
+    repeats = np.flatnonzero(occurrence > 0)
+    if not len(repeats):
+        return hashes
+    hashes = hashes.copy()
+    parts = pd.DataFrame({"key": hashes[repeats], "occurrence": occurrence[repeats]})
+    hashes[repeats] = pd.util.hash_pandas_object(parts, index=False).to_numpy()
+    return hashes
+
+
+def row_keys(frame, key=KEY):
+    """uint64 hash of each row's ``key`` columns.
+
+    A key repeated within the frame is told apart by its occurrence number,
+    so the n-th duplicate of one snapshot matches the n-th of the next;
+    rows whose key is not repeated hash the same whether or not others are.
+    """
+    return _number_repeats(_key_hashes(frame, key))
+
+
+def row_fingerprints(frame, columns):
+    """uint64 hash of each row's ``columns``, compared as float64 (so dtypes do not matter)."""
+    #+ 0.0 turns -0.0 into 0.0, which would otherwise hash differently
+    values = frame[list(columns)].to_numpy(dtype="float64") + 0.0
+    return pd.util.hash_pandas_object(pd.DataFrame(values), index=False).to_numpy()
+
+
+def _concat(parts, dtype):
+    return np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+
+
+@dataclass
+class Signature:
+    """Key hash, value fingerprint and data_quality of every row of a snapshot, in file order."""
+
+    keys: np.ndarray
+    fingerprints: np.ndarray
+    quality: np.ndarray
+    columns: tuple
+
+    @classmethod
+    def from_frame(cls, frame, columns=None, key=KEY):
+        columns = tuple(cost_columns(frame) if columns is None else columns)
+        return cls(row_keys(frame, key), row_fingerprints(frame, columns + ("data_quality",)),
+                   frame["data_quality"].to_numpy(dtype="int8"), columns)
+
+    @classmethod
+    def from_csv(cls, path, columns=None, key=KEY, chunksize=200_000):
+        """Signature of a CSV read ``chunksize`` rows at a time.
+
+        Duplicated keys are numbered over the whole file, as in
+        :meth:`from_frame`.
+        """
+        keys, fingerprints, quality = [], [], []
+        with pd.read_csv(path, chunksize=chunksize) as reader:
+            for chunk in reader:
+                if columns is None:
+                    columns = tuple(cost_columns(chunk))
+                keys.append(_key_hashes(chunk, key))
+                fingerprints.append(row_fingerprints(chunk, tuple(columns) + ("data_quality",)))
+                quality.append(chunk["data_quality"].to_numpy(dtype="int8"))
+        keys = _number_repeats(_concat(keys, "uint64"))
+        return cls(keys, _concat(fingerprints, "uint64"), _concat(quality, "int8"), tuple(columns or ()))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def save(self, path):
+        np.savez(path, keys=self.keys, fingerprints=self.fingerprints, quality=self.quality,
+                 columns=np.array(self.columns))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["keys"], data["fingerprints"], data["quality"], tuple(data["columns"].tolist()))
+
+    def match(self, other):
+        """Row positions of ``other``'s keys in this signature, -1 where absent."""
+        if not len(self.keys):
+            return np.full(len(other), -1)
+        order = np.argsort(self.keys, kind="stable")
+        ordered = self.keys[order]
+        found = np.minimum(np.searchsorted(ordered, other.keys), len(order) - 1)
+        return np.where(ordered[found] == other.keys, order[found], -1)
+
+
+@dataclass
+class RowChanges:
+    """Positions of the rows that differ between an old and a new signature."""
+
+    added: np.ndarray
+    removed: np.ndarray
+    changed_old: np.ndarray
+    changed_new: np.ndarray
+    unchanged: int
+
+
+def compare(old, new):
+    """:class:`RowChanges` of two :class:`Signature`\\ s, from their hashes alone."""
+    if old.columns != new.columns:
+        raise ValueError("signatures cover different columns")
+    in_old = old.match(new)
+    present = in_old >= 0
+    seen = np.zeros(len(old), dtype=bool)
+    seen[in_old[present]] = True
+    new_pos = np.flatnonzero(present)
+    differs = old.fingerprints[in_old[present]] != new.fingerprints[present]
+    return RowChanges(added=np.flatnonzero(~present), removed=np.flatnonzero(~seen),
+                      changed_old=in_old[present][differs], changed_new=new_pos[differs],
+                      unchanged=int((~differs).sum()))
+
+
+def read_rows(path, positions, chunksize=200_000, **read_csv_kwargs):
+    """Rows of a CSV at sorted file ``positions``, read in chunks; the index is the position."""
+    positions = np.sort(np.asarray(positions, dtype="int64"))
+    parts = []
+    with pd.read_csv(path, chunksize=chunksize, **read_csv_kwargs) as reader:
+        for chunk in reader:
+            lo, hi = np.searchsorted(positions, [chunk.index[0], chunk.index[-1] + 1])
+            if hi > lo:
+                parts.append(chunk.loc[positions[lo:hi]])
+    if not parts:
+        return pd.read_csv(path, nrows=0, **read_csv_kwargs)
+    return pd.concat(parts)
+
+
+@dataclass
+class SnapshotDiff:
+    """Rows that differ between two snapshots, with their key hashes as index.
+
+    ``added`` and ``removed`` hold whole rows of the new and old snapshot;
+    ``old_changed`` and ``new_changed`` the two versions of every changed
+    row, aligned. ``unchanged`` counts the rest.
+    """
+
+    added: pd.DataFrame
+    removed: pd.DataFrame
+    old_changed: pd.DataFrame
+    new_changed: pd.DataFrame
+    unchanged: int
+    columns: tuple
+    key: tuple = KEY
+
+    def summary(self):
+        flips = self.quality_flips()
+        return {"added": len(self.added), "removed": len(self.removed),
+                "changed": len(self.new_changed), "unchanged": self.unchanged,
+                "cells_changed": int(self._changed_cells().sum()),
+                "quality_0_to_1": int((flips["new"] == 1).sum()),
+                "quality_1_to_0": int((flips["new"] == 0).sum())}
+
+    def _changed_cells(self):
+        old = self.old_changed[list(self.columns)].to_numpy(dtype="float64")
+        new = self.new_changed[list(self.columns)].to_numpy(dtype="float64")
+        #NaN to NaN is no change, NaN to a value (or back) is
+        return ~((old == new) | (np.isnan(old) & np.isnan(new)))
+
+    def cells(self):
+        """Long table of changed cells: key, column, old and new value and their difference."""
+        mask = self._changed_cells()
+        rows, cols = np.nonzero(mask)
+        table = pd.DataFrame({col: np.asarray(self.new_changed[col], dtype=object)[rows]
+                              for col in self.key})
+        table["column"] = np.asarray(self.columns)[cols]
+        table["old"] = self.old_changed[list(self.columns)].to_numpy(dtype="float64")[rows, cols]
+        table["new"] = self.new_changed[list(self.columns)].to_numpy(dtype="float64")[rows, cols]
+        table["delta"] = table["new"] - table["old"]
+        return table
+
+    def quality_flips(self):
+        """Changed rows whose data_quality went from 0 to 1 or from 1 to 0."""
+        old = self.old_changed["data_quality"].to_numpy()
+        new = self.new_changed["data_quality"].to_numpy()
+        flipped = np.flatnonzero(old != new)
+        table = self.new_changed[list(self.key)].iloc[flipped].copy()
+        table["old"] = old[flipped]
+        table["new"] = new[flipped]
+        return table
+
+    def column_deltas(self):
+        """Per column: changed cells, cells gaining or losing a value, and the mean and median change."""
+        old = self.old_changed[list(self.columns)].to_numpy(dtype="float64")
+        new = self.new_changed[list(self.columns)].to_numpy(dtype="float64")
+        changed = self._changed_cells()
+        delta = np.where(changed, new - old, np.nan)
+        with warnings.catch_warnings():
+            #nanmean/nanmedian warn about columns in which nothing changed
+            warnings.simplefilter("ignore", RuntimeWarning)
+            table = pd.DataFrame({
+                "changed": changed.sum(axis=0),
+                "filled": (np.isnan(old) & ~np.isnan(new)).sum(axis=0),
+                "emptied": (~np.isnan(old) & np.isnan(new)).sum(axis=0),
+                "mean_delta": np.nanmean(delta, axis=0),
+                "median_delta": np.nanmedian(delta, axis=0),
+                "mean_abs_delta": np.nanmean(np.abs(delta), axis=0),
+            }, index=list(self.columns))
+        return table.sort_values("changed", ascending=False, kind="stable")
+
+    def apply(self, index, quality=1, formula=DEFAULT_FORMULA):
+        """Push the difference into an :class:`~cost_of_living.aggregate_index.AggregateIndex`.
+
+        The index must have been built from the old snapshot with
+        :func:`index_snapshot`, so its rows are labelled by key. Removed rows and the old version of changed rows are taken
+        out; added and changed rows go through the cleaning and disposable
+        income stages and are added. Returns the cleaned new rows.
+        """
+        stale = [label for label in list(self.removed.index) + list(self.old_changed.index)
+                 if label in index]
+        index.remove(stale)
+        rows = clean_rows(pd.concat([self.added, self.new_changed]), quality, formula)
+        index.add(rows)
+        return rows
+
+
+def clean_rows(frame, quality=1, formula=DEFAULT_FORMULA):
+    """The ``quality`` rows of ``frame`` without missing values, with disposable income.
+
+    These are the notebook's cleaning and disposable income stages (2.3,
+    2.2.3, 3.3.1); data_quality is kept so the rows can go into an
+    :class:`~cost_of_living.aggregate_index.AggregateIndex`.
+    """
+    partitions = partition_by_quality(frame, values=(quality,), null_policy="drop", drop_column=False)
+    rows = partitions[quality].frame
+    rows["disposable_income"] = disposable_income(rows, formula)
+    return rows
+
+
+def index_snapshot(frame, quality=1, formula=DEFAULT_FORMULA, key=KEY, columns=DEFAULT_COLUMNS):
+    """:class:`~cost_of_living.aggregate_index.AggregateIndex` of a snapshot, for :meth:`SnapshotDiff.apply`.
+
+    The :func:`clean_rows` of ``frame`` are labelled by :func:`row_keys`,
+    the labels the diff uses.
+    """
+    labelled = frame.set_axis(pd.Index(row_keys(frame, key), name="key"), axis=0)
+    index = AggregateIndex(columns, formula)
+    index.add(clean_rows(labelled, quality, formula))
+    return index
+
+
+def _labelled(frame, keys, positions):
+    rows = frame.iloc[positions].copy()
+    rows.index = pd.Index(keys[positions], name="key")
+    return rows
+
+
+def diff_frames(old, new, columns=None, key=KEY, old_signature=None):
+    """:class:`SnapshotDiff` of two snapshot frames (``old_signature`` saves hashing ``old`` again)."""
+    columns = tuple(cost_columns(new) if columns is None else columns)
+    old_sig = old_signature or Signature.from_frame(old, columns, key)
+    new_sig = Signature.from_frame(new, columns, key)
+    changes = compare(old_sig, new_sig)
+    return SnapshotDiff(_labelled(new, new_sig.keys, changes.added),
+                        _labelled(old, old_sig.keys, changes.removed),
+                        _labelled(old, old_sig.keys, changes.changed_old),
+                        _labelled(new, new_sig.keys, changes.changed_new),
+                        changes.unchanged, columns, tuple(key))
+
+
+def diff_csv(old_path, new_path, columns=None, key=KEY, chunksize=200_000, old_signature=None):
+    """:class:`SnapshotDiff` of two snapshot CSVs in bounded memory.
+
+    Both files are hashed chunk by chunk (``old_signature``, e.g. saved with
+    :meth:`Signature.save` at the previous scrape, saves hashing the old
+    file again), then a second chunked pass over each file keeps only the
+    rows that differ.
+    Memory is the chunk, 24 bytes per row and the differing rows.
+    """
+    old_sig = old_signature or Signature.from_csv(old_path, columns, key, chunksize)
+    new_sig = Signature.from_csv(new_path, columns, key, chunksize)
+    changes = compare(old_sig, new_sig)
+    old_rows = read_rows(old_path, np.concatenate([changes.removed, changes.changed_old]), chunksize)
+    new_rows = read_rows(new_path, np.concatenate([changes.added, changes.changed_new]), chunksize)
+
+    def pick(rows, keys, positions):
+        part = rows.loc[positions]
+        part.index = pd.Index(keys[positions], name="key")
+        return part
+
+    return SnapshotDiff(pick(new_rows, new_sig.keys, changes.added),
+                        pick(old_rows, old_sig.keys, changes.removed),
+                        pick(old_rows, old_sig.keys, changes.changed_old),
+                        pick(new_rows, new_sig.keys, changes.changed_new),
+                        changes.unchanged, new_sig.columns, tuple(key))
@@ -0,0 +1,191 @@
+"""Per-country and country-weighted aggregates from one reusable group index.
+
+Section 5.2 notes that US cities dominate the data, so the global means of
+3.1.2 and the rent and basics shares of salary in 3.2 mostly describe the
+US. :class:`GroupIndex` factorizes ``country`` once into integer codes and
+a row order grouped by code; counts, sums, means and percentiles of every
+column then come from ``np.add.reduceat`` over that order (and one sort
+per column for percentiles) instead of a separate ``groupby`` per metric.
+:meth:`GroupIndex.stratified` combines the per-country results with each
+country weighted equally or by population.
+"""
+import numpy as np
+import pandas as pd
+
+DEFAULT_PERCENTILES = (0.25, 0.5, 0.75)
+
+
+def _stat_name(q):
+    return "median" if q == 0.5 else "p%g" % (q * 100)
+
+
+def load_population(path="population.csv", country="country", population="population"):
+    """Population by country from a local CSV, as a Series for ``weights=``."""
+    table = pd.read_csv(path, usecols=[country, population])
+    return table.groupby(country)[population].sum()
+
+
+class GroupIndex:
+    """Integer codes of a key column and the row order that groups them.
+
+    Built once with :meth:`from_frame` and reused for every column and
+    statistic of frames with the same rows (e.g. the cleaned good rows).
+    Missing keys get no group and are left out of every aggregate.
+    """
+
+    def __init__(self, keys):
+        codes, self.labels = pd.factorize(np.asarray(keys, dtype=object), sort=True)
+        #group of every row, -1 for a missing key
+        self.row_codes = codes
+        keep = codes >= 0
+        self.codes = codes[keep]
+        #positions of the rows with a key, grouped by code (file order within a group)
+        self.order = np.flatnonzero(keep)[np.argsort(self.codes, kind="stable")]
+        self.sizes = np.bincount(self.codes, minlength=len(self.labels))
+        self.starts = np.concatenate([[0], np.cumsum(self.sizes)[:-1]])
+
+    @classmethod
+    def from_frame(cls, frame, column="country"):
+        return cls(frame[column])
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _grouped(self, frame, columns):
+        #(rows with a key, columns) float64 values in group order
+        return frame[list(columns)].to_numpy(dtype="float64")[self.order]
+
+    def _reduce(self, values):
+        #per-group sums of each column; reduceat needs non-empty groups
+        out = np.zeros((len(self), values.shape[1]))
+        nonempty = self.sizes > 0
+        if nonempty.any():
+            out[nonempty] = np.add.reduceat(values, self.starts[nonempty], axis=0)
+        return out
+
+    def counts(self, frame, columns):
+        """Non-missing values per group and column."""
+        valid = ~np.isnan(self._grouped(frame, columns))
+        return pd.DataFrame(self._reduce(valid).astype("int64"), index=self.labels,
+                            columns=list(columns))
+
+    def _moments(self, values):
+        valid = ~np.isnan(values)
+        counts = self._reduce(valid)
+        sums = self._reduce(np.where(valid, values, 0.0))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = sums / counts
+        return counts, means
+
+    def means(self, frame, columns):
+        """Mean of each column per group (NaN for a group with no values)."""
+        _, means = self._moments(self._grouped(frame, columns))
+        return pd.DataFrame(means, index=self.labels, columns=list(columns))
+
+    def _quantiles(self, values, counts, percentiles):
+        #one (groups, columns) array per percentile, linear interpolation as in pandas
+        #small integer codes let the stable sort below use radix sort
+        codes = np.repeat(np.arange(len(self), dtype=np.min_scalar_type(len(self))), self.sizes)
+        out = [np.full((len(self), values.shape[1]), np.nan) for _ in percentiles]
+        has = counts > 0
+        for j in range(values.shape[1]):
+            #within each group, sorted values first and NaN last
+            order = np.argsort(values[:, j])
+            ordered = values[order[np.argsort(codes[order], kind="stable")], j]
+            groups = np.flatnonzero(has[:, j])
+            n = counts[groups, j]
+            for result, q in zip(out, percentiles):
+                pos = (n - 1) * q
+                lo = np.floor(pos).astype("int64")
+                hi = np.minimum(lo + 1, n.astype("int64") - 1)
+                a = ordered[self.starts[groups] + lo]
+                b = ordered[self.starts[groups] + hi]
+                result[groups, j] = a + (b - a) * (pos - lo)
+        return out
+
+    def quantiles(self, frame, columns, percentiles=DEFAULT_PERCENTILES):
+        """``{percentile: DataFrame}`` of each column's percentiles per group."""
+        values = self._grouped(frame, columns)
+        counts, _ = self._moments(values)
+        results = self._quantiles(values, counts, percentiles)
+        return {q: pd.DataFrame(r, index=self.labels, columns=list(columns))
+                for q, r in zip(percentiles, results)}
+
+    def aggregate(self, frame, columns, percentiles=DEFAULT_PERCENTILES):
+        """Per-group count, mean and percentiles of ``columns`` in one pass.
+
+        Returns a frame indexed by group with ``(column, statistic)``
+        columns, plus ``cities`` and, when x48, x36 and x54 are among the
+        columns, the group's rent and basics share of salary (as 3.2).
+        """
+        columns = list(columns)
+        values = self._grouped(frame, columns)
+        counts, means = self._moments(values)
+        stats = {"count": counts.astype("int64"), "mean": means}
+        for q, result in zip(percentiles, self._quantiles(values, counts, percentiles)):
+            stats[_stat_name(q)] = result
+        table = pd.DataFrame({(col, name): stat[:, j] for j, col in enumerate(columns)
+                              for name, stat in stats.items()}, index=self.labels)
+        table.insert(0, "cities", self.sizes)
+        for name, col in (("rent_pct", "x48"), ("basic_pct", "x36")):
+            if col in columns and "x54" in columns:
+                table[name] = table[(col, "mean")] / table[("x54", "mean")] * 100
+        return table
+
+    def group_weights(self, weights="equal"):
+        """Weight of each group: ``"equal"``, ``"rows"`` or a country -> population mapping.
+
+        Countries missing from a population mapping get no weight.
+        """
+        if isinstance(weights, str):
+            if weights == "equal":
+                return np.ones(len(self))
+            if weights == "rows":
+                return self.sizes.astype("float64")
+            raise ValueError("weights must be 'equal', 'rows' or a mapping, not %r" % weights)
+        weights = pd.Series(weights, dtype="float64")
+        return weights.reindex(self.labels).fillna(0.0).to_numpy()
+
+    def stratified(self, frame, columns, weights="equal", percentiles=DEFAULT_PERCENTILES):
+        """Country-weighted mean and percentiles of each column.
+
+        Each group's mean enters the mean with its weight from
+        :meth:`group_weights`; for percentiles every row carries its
+        group's weight shared among the group's rows, and the percentile is
+        interpolated between the mid-points of the rows' cumulative weights.
+        ``weights="rows"`` gives the plain (US-dominated) statistics.
+        Returns a frame with one row per statistic and a column per column,
+        plus ``rent_pct`` and ``basic_pct`` (x48 and x36 over x54, as in 3.2).
+        """
+        columns = list(columns)
+        values = self._grouped(frame, columns)
+        counts, means = self._moments(values)
+        if isinstance(weights, str) and weights == "rows":
+            #each value counts once, whatever is missing in other columns
+            group_w = counts
+        else:
+            group_w = self.group_weights(weights)[:, None] * (counts > 0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.nansum(np.where(counts > 0, means, 0.0) * group_w, axis=0) / group_w.sum(axis=0)
+            row_w = np.repeat(group_w / np.where(counts > 0, counts, 1), self.sizes, axis=0)
+        stats = {"mean": mean}
+        for q in percentiles:
+            stats[_stat_name(q)] = np.array([
+                _weighted_quantile(values[:, j], row_w[:, j], q) for j in range(len(columns))])
+        table = pd.DataFrame(stats, index=columns).T
+        if "x54" in columns:
+            for name, col in (("rent_pct", "x48"), ("basic_pct", "x36")):
+                if col in columns:
+                    table[name] = table[col] / table["x54"] * 100
+        return table
+
+
+def _weighted_quantile(values, weights, q):
+    keep = ~np.isnan(values) & (weights > 0)
+    if not keep.any():
+        return np.nan
+    values, weights = values[keep], weights[keep]
+    order = np.argsort(values, kind="stable")
+    values, weights = values[order], weights[order]
+    midpoints = (np.cumsum(weights) - weights / 2) / weights.sum()
+    return float(np.interp(q, midpoints, values))
@@ -0,0 +1,272 @@
+"""Joining Cost_of_living_v2 rows to country and city level datasets.
+
+Section 2.1.1 looks at the 'Avg monthly salary' and
+'Cost_of_Living_Index_2022' datasets, which name countries and cities
+differently ("USA", "Türkiye", "new york"). Names are normalized (accents,
+case, punctuation, then aliases) once per distinct value; the other
+table's keys go into a :class:`KeyIndex` (a hash index built once and
+reused for every snapshot), so an exact join is one hash lookup per
+distinct key. Keys left over are matched by the Dice similarity of their
+character bigrams, which a dropped, doubled or swapped letter only moves
+a little, within blocks of keys sharing their first letter (and, for city
+keys, the country).
+"""
+import re
+import unicodedata
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .groups import GroupIndex
+
+#normalized alias -> normalized canonical name (the Numbeo spelling)
+COUNTRY_ALIASES = {
+    "usa": "united states",
+    "us": "united states",
+    "u s a": "united states",
+    "united states of america": "united states",
+    "uk": "united kingdom",
+    "great britain": "united kingdom",
+    "britain": "united kingdom",
+    "uae": "united arab emirates",
+    "czechia": "czech republic",
+    "turkiye": "turkey",
+    "russian federation": "russia",
+    "korea republic of": "south korea",
+    "republic of korea": "south korea",
+    "korea south": "south korea",
+    "viet nam": "vietnam",
+    "iran islamic republic of": "iran",
+    "cote d ivoire": "ivory coast",
+    "hong kong china": "hong kong",
+    "hong kong sar": "hong kong",
+    "macao china": "macao",
+    "north macedonia": "macedonia",
+    "taiwan china": "taiwan",
+    "kosovo disputed territory": "kosovo",
+    "dr congo": "democratic republic of the congo",
+    "congo dem rep": "democratic republic of the congo",
+    "myanmar burma": "myanmar",
+}
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+EXACT, FUZZY = 1, 2
+
+
+def normalize_name(name, aliases=None):
+    """Lower case ASCII words of ``name``, mapped through ``aliases``.
+
+    ``"Türkiye"``, ``"TURKEY"`` and ``" turkey."`` all give ``"turkey"``;
+    missing values give ``None``.
+    """
+    if not isinstance(name, str):
+        return None
+    text = unicodedata.normalize("NFKD", name)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    text = _NON_ALNUM.sub(" ", text).strip()
+    if aliases:
+        text = aliases.get(text, text)
+    return text or None
+
+
+class Normalizer:
+    """Memoized :func:`normalize_name` over whole columns.
+
+    Each distinct value is normalized once, and the memo is kept between
+    calls, so later snapshots only pay for names not seen before.
+    """
+
+    def __init__(self, aliases=None):
+        self.aliases = aliases
+        self.memo = {}
+
+    def __call__(self, values):
+        codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+        memo = self.memo
+        names = []
+        for value in uniques:
+            name = memo.get(value)
+            if name is None and value not in memo:
+                name = memo[value] = normalize_name(value, self.aliases)
+            names.append(name)
+        #code -1 (missing) picks the trailing None
+        return np.asarray(names + [None], dtype=object)[codes]
+
+
+def _distinct(frame, on):
+    """Code of each row's raw key, and the first row of each distinct key."""
+    codes = frame.groupby(list(on), sort=False, dropna=False, observed=True).ngroup().to_numpy()
+    #ngroup numbers keys in order of appearance, so firsts come out in code order
+    firsts = np.unique(codes, return_index=True)[1]
+    return codes, frame.iloc[firsts]
+
+
+def _keys(frame, on, normalizers):
+    #one key string per row, None when any part is missing; only run on distinct rows
+    parts = [normalizers[col](frame[col]) for col in on]
+    if len(parts) == 1:
+        return parts[0]
+    keys = np.empty(len(frame), dtype=object)
+    for i, values in enumerate(zip(*parts)):
+        keys[i] = None if None in values else "|".join(values)
+    return keys
+
+
+def _bigrams(text):
+    padded = " %s " % text
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+def _dice(a, b):
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+class KeyIndex:
+    """Hash index of a table's normalized join keys.
+
+    ``on`` names the key columns of the table (``("country",)`` or
+    ``("city", "country")``); the country column is normalized with
+    :data:`COUNTRY_ALIASES`. For a duplicated key the first row wins.
+    Build it once for an external table and pass it to :meth:`join` for
+    every snapshot.
+    """
+
+    def __init__(self, table, on=("country",), country="country", aliases=COUNTRY_ALIASES):
+        self.on = tuple(on)
+        self.table = table
+        self.normalizers = {col: Normalizer(aliases if col == country else None) for col in self.on}
+        raw, distinct = _distinct(table, self.on)
+        keys = _keys(distinct, self.on, self.normalizers)[raw]
+        present = np.flatnonzero(pd.notna(keys))
+        index = pd.Index(keys[present])
+        first = ~index.duplicated()
+        self.keys = index[first]
+        self.positions = present[first]
+        self._blocks = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _block(self, key):
+        #city keys block on (country, first letter of city), country keys on the first letter;
+        #the bigrams are of the first part only, the rest is equal within a block
+        head, _, tail = key.partition("|")
+        return (head[:1], tail), _bigrams(head)
+
+    def blocks(self):
+        """``{block: [(key position, bigrams), ...]}`` for the fuzzy fallback, built on first use."""
+        if self._blocks is None:
+            self._blocks = {}
+            for i, key in enumerate(self.keys):
+                block, grams = self._block(key)
+                self._blocks.setdefault(block, []).append((i, grams))
+        return self._blocks
+
+    def lookup(self, keys):
+        """Row position in the table of each key, -1 where there is no exact match."""
+        found = self.keys.get_indexer(pd.Index(keys))
+        return np.where(found >= 0, self.positions[np.maximum(found, 0)], -1)
+
+    def fuzzy(self, key, threshold):
+        """Best ``(key number, score)`` for ``key`` in its block, or ``(-1, score)``."""
+        block, grams = self._block(key)
+        best, score = -1, 0.0
+        for i, other in self.blocks().get(block, ()):
+            s = _dice(grams, other)
+            if s > score:
+                best, score = i, s
+        return (best if score >= threshold else -1), score
+
+    def join(self, frame, on=None, fuzzy=True, threshold=0.7):
+        """Match every row of ``frame`` to a row of the table.
+
+        ``on`` names ``frame``'s key columns, in the order of the index's
+        (defaults to the same names). Distinct keys are looked up once;
+        keys without an exact match are tried with the fuzzy fallback if
+        ``fuzzy`` is set, and matched when their best score reaches
+        ``threshold``. At 0.7 a dropped or doubled letter matches in any
+        name of five or more letters; near names (Austria for a missing
+        Australia) can match too, so check ``fuzzy_matches``.
+        """
+        on = self.on if on is None else tuple(on)
+        raw, distinct = _distinct(frame, on)
+        distinct = distinct[list(on)].set_axis(list(self.on), axis=1)
+        keys, uniques = pd.factorize(_keys(distinct, self.on, self.normalizers))
+        uniques = np.asarray(uniques, dtype=object)
+        found = self.lookup(uniques)
+        method = np.where(found >= 0, EXACT, 0).astype("int8")
+        fuzzy_matches = []
+        if fuzzy:
+            for u in np.flatnonzero(found < 0):
+                i, score = self.fuzzy(uniques[u], threshold)
+                if i >= 0:
+                    found[u] = self.positions[i]
+                    method[u] = FUZZY
+                    fuzzy_matches.append((uniques[u], self.keys[i], score))
+        #row -> distinct raw key -> normalized key; -1 (missing) picks the trailing "no match"
+        codes = keys[raw]
+        found = np.append(found, -1)[codes]
+        method = np.append(method, 0).astype("int8")[codes]
+        return JoinResult(frame, self.table, found, method,
+                          pd.DataFrame(fuzzy_matches, columns=["key", "matched", "score"]))
+
+
+@dataclass
+class JoinResult:
+    """Row positions in ``right`` matched to each row of ``left``.
+
+    ``positions`` is -1 for unmatched rows; ``method`` is 0 (unmatched),
+    ``EXACT`` or ``FUZZY``. ``fuzzy_matches`` lists the distinct keys
+    matched by similarity, for review.
+    """
+
+    left: pd.DataFrame
+    right: pd.DataFrame
+    positions: np.ndarray
+    method: np.ndarray
+    fuzzy_matches: pd.DataFrame
+
+    def stats(self):
+        """Row counts and rates of exact, fuzzy and missing matches."""
+        rows = len(self.positions)
+        exact = int((self.method == EXACT).sum())
+        fuzzy = int((self.method == FUZZY).sum())
+        return {"rows": rows, "exact": exact, "fuzzy": fuzzy, "unmatched": rows - exact - fuzzy,
+                "match_rate": (exact + fuzzy) / rows if rows else float("nan"),
+                "exact_rate": exact / rows if rows else float("nan")}
+
+    def unmatched(self, column, top=10):
+        """The values of ``left[column]`` most often left unmatched."""
+        return self.left[column][self.method == 0].value_counts().head(top)
+
+    def frame(self, columns=None, suffix="_ext"):
+        """``left`` with ``columns`` of ``right`` (default all) alongside, NaN where unmatched."""
+        right = self.right if columns is None else self.right[list(columns)]
+        #an all-NaN row after the table stands in for "no match"
+        right = right.reset_index(drop=True)
+        padded = right.reindex(np.arange(len(right) + 1))
+        values = padded.take(np.where(self.positions >= 0, self.positions, len(right)))
+        values.index = self.left.index
+        clash = [col for col in values.columns if col in self.left.columns]
+        values = values.rename(columns={col: col + suffix for col in clash})
+        return pd.concat([self.left, values], axis=1)
+
+
+def compare_salaries(result, value, salary="x54", groups="country"):
+    """Median of ``salary`` next to a joined external figure ``value``, per group.
+
+    ``result`` is the :class:`JoinResult` of a cost of living frame against
+    a table with a ``value`` column, e.g. a monthly salary per country.
+    Returns the cities, both figures and their ratio per group, sorted by
+    ratio; groups without a match have a NaN ratio.
+    """
+    joined = result.frame([value])
+    column = value + "_ext" if value in result.left.columns else value
+    index = GroupIndex.from_frame(joined, groups)
+    medians = index.quantiles(joined, [salary, column], percentiles=(0.5,))[0.5]
+    table = medians.rename(columns={salary: salary + "_median", column: "external"})
+    table.insert(0, "cities", index.sizes)
+    table["ratio"] = table[salary + "_median"] / table["external"]
+    return table.sort_values("ratio")
@@ -0,0 +1,184 @@
+"""Typed, column-pruned loading of Cost_of_living_v2.csv with a binary cache.
+
+The schema comes from the column map in Table.csv (city, country, x1 ... x55,
+data_quality). Prices and salaries are stored as float32, country as a
+category and data_quality as int8. Each column read from the CSV is also
+written to a cache directory as a .npy file and reused until the source
+file changes.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_TABLE = "Table.csv"
+DEFAULT_CSV = "Cost_of_living_v2.csv"
+
+#columns the analysis in DataProg actually uses
+ANALYSIS_COLUMNS = ["city", "country", "x1", "x2", "x36", "x48", "x54", "data_quality"]
+
+_MANIFEST = "manifest.json"
+
+
+def load_schema(table_path=DEFAULT_TABLE, float_dtype="float32"):
+    """Build a ``{column: dtype}`` schema from the column map in Table.csv."""
+    table = pd.read_csv(table_path, index_col=0)
+    return schema_for(list(table.index), float_dtype)
+
+
+def schema_for(columns, float_dtype="float32"):
+    """The ``{column: dtype}`` schema of :func:`load_schema` for a list of column names."""
+    columns = list(columns)
+    if "data_quality" not in columns:
+        columns.append("data_quality")
+    return {col: _column_dtype(col, float_dtype) for col in columns}
+
+
+def _column_dtype(column, float_dtype):
+    if column == "city":
+        return "object"
+    if column == "country":
+        return "category"
+    if column == "data_quality":
+        return "int8"
+    return float_dtype
+
+
+def file_signature(path, use_hash=False):
+    """Size and mtime of ``path`` (plus its SHA-1 if ``use_hash``)."""
+    stat = os.stat(path)
+    signature = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if use_hash:
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        signature["sha1"] = digest.hexdigest()
+    return signature
+
+
+def load_cost_of_living(path=DEFAULT_CSV, columns=None, schema=None, cache_dir=None,
+                        use_hash=False):
+    """Load ``columns`` of the cost of living CSV with compact dtypes.
+
+    ``columns`` defaults to :data:`ANALYSIS_COLUMNS`; pass ``"all"`` for every
+    column in the schema. ``schema`` defaults to :func:`load_schema`.
+    ``cache_dir`` defaults to ``<path>.cache``; pass ``False`` to disable the
+    cache. The cache is invalidated when the size or mtime of the CSV change,
+    or its SHA-1 if ``use_hash`` is set (slower, but survives a re-download of
+    identical data).
+    """
+    if schema is None:
+        schema = load_schema()
+    if columns is None:
+        columns = ANALYSIS_COLUMNS
+    elif columns == "all":
+        columns = list(schema)
+    columns = list(columns)
+
+    if cache_dir is False:
+        return _read_csv(path, columns, schema)
+
+    cache = ColumnCache(cache_dir or path + ".cache", path, use_hash)
+    data = cache.load(columns, schema)
+    missing = [col for col in columns if col not in data]
+    if missing:
+        frame = _read_csv(path, missing, schema)
+        cache.store(frame)
+        for col in missing:
+            data[col] = frame[col]
+    return pd.DataFrame({col: data[col] for col in columns})
+
+
+def _read_csv(path, columns, schema):
+    dtypes = {col: schema[col] for col in columns if col in schema}
+    frame = pd.read_csv(path, usecols=columns, dtype=dtypes)
+    return frame[columns]
+
+
+class ColumnCache:
+    """Directory of one .npy file per column, tied to a source file signature.
+
+    Numeric columns are saved as they are. Category and text columns are
+    dictionary encoded: int32 codes on disk, the values in the manifest.
+    """
+
+    def __init__(self, directory, source, use_hash=False):
+        self.directory = directory
+        self.source = source
+        self.signature = file_signature(source, use_hash)
+        self.manifest = self._read_manifest()
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.directory, _MANIFEST)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = None
+        if manifest is None or manifest.get("source") != self.signature:
+            #source file changed (or no cache yet): start again
+            manifest = {"source": self.signature, "columns": {}}
+        return manifest
+
+    def load(self, columns, schema):
+        """Return ``{column: Series}`` for the requested columns in the cache."""
+        data = {}
+        for col in columns:
+            entry = self.manifest["columns"].get(col)
+            if entry is None or entry["dtype"] != str(schema.get(col)):
+                continue
+            try:
+                values = np.load(os.path.join(self.directory, entry["file"]))
+            except OSError:
+                continue
+            if "values" in entry:
+                values = decode_dictionary(values, entry["values"], entry["kind"])
+            data[col] = pd.Series(values, name=col, dtype=entry["dtype"])
+        return data
+
+    def store(self, frame):
+        os.makedirs(self.directory, exist_ok=True)
+        for col in frame.columns:
+            series = frame[col]
+            entry = {"dtype": str(series.dtype), "file": col + ".npy"}
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                #codes follow the categories, unused ones included
+                entry["values"] = series.cat.categories.tolist()
+                values = encode_dictionary(series, entry["values"])
+                entry["kind"] = "category"
+            elif series.dtype == object:
+                entry["values"] = []
+                values = encode_dictionary(series, entry["values"])
+                entry["kind"] = "object"
+            else:
+                values = series.to_numpy()
+            np.save(os.path.join(self.directory, entry["file"]), values)
+            self.manifest["columns"][col] = entry
+        with open(os.path.join(self.directory, _MANIFEST), "w") as f:
+            json.dump(self.manifest, f)
+
+
+def encode_dictionary(series, dictionary):
+    """int32 codes of ``series``, adding unseen values to the end of the ``dictionary`` list."""
+    codes, uniques = pd.factorize(series.astype(object))
+    known = {value: i for i, value in enumerate(dictionary)}
+    mapping = np.empty(len(uniques) + 1, dtype="int32")
+    for i, value in enumerate(uniques):
+        if value not in known:
+            known[value] = len(dictionary)
+            dictionary.append(value)
+        mapping[i] = known[value]
+    #code -1 (missing) maps to the trailing -1
+    mapping[-1] = -1
+    return mapping[codes]
+
+
+def decode_dictionary(codes, dictionary, kind):
+    """Values of dictionary ``codes``: a Categorical for ``kind="category"``, else objects."""
+    if kind == "category":
+        return pd.Categorical.from_codes(codes, categories=dictionary)
+    values = np.asarray(dictionary + [np.nan], dtype=object)
+    #code -1 (missing) picks the trailing NaN
+    return values[codes]
@@ -0,0 +1,125 @@
+"""Packed per-row bitmap of missing values.
+
+Section 2.2.2 counts nulls with ``isnull().sum()`` on each partition and
+then drops every row with any null, losing most of the data because of a
+few sparse columns. :class:`NullBitmap` is built once: bit ``j`` of a row
+is set when column ``j`` is missing, packed 64 columns to a ``uint64``
+word. Null counts per column or partition, the most common missing-column
+patterns and "how many rows survive if only these columns are required"
+then come from bit operations and popcounts on the packed words instead of
+new scans of the frame.
+"""
+import numpy as np
+import pandas as pd
+
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype="uint8")
+
+
+def popcount(words):
+    """Number of set bits in each row of a ``(rows, words)`` uint64 array."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).sum(axis=1, dtype="int64")
+    #NumPy < 2.0: count bytes through a lookup table
+    return _POPCOUNT8[words.view("uint8")].sum(axis=1, dtype="int64")
+
+
+class NullBitmap:
+    """Null bits of ``columns`` for every row of a frame, 64 columns per word."""
+
+    def __init__(self, words, columns, index):
+        self.words = words
+        self.columns = list(columns)
+        self.index = index
+        self._position = {col: j for j, col in enumerate(self.columns)}
+
+    @classmethod
+    def from_frame(cls, frame, columns=None):
+        columns = list(frame.columns if columns is None else columns)
+        words = np.zeros((len(frame), max(1, -(-len(columns) // 64))), dtype="uint64")
+        for j, col in enumerate(columns):
+            missing = frame[col].isna().to_numpy()
+            words[:, j // 64] |= missing.astype("uint64") << np.uint64(j % 64)
+        return cls(words, columns, frame.index)
+
+    def __len__(self):
+        return len(self.words)
+
+    def mask(self, columns):
+        """Packed words with the bits of ``columns`` set."""
+        mask = np.zeros(self.words.shape[1], dtype="uint64")
+        for col in columns:
+            j = self._position[col]
+            mask[j // 64] |= np.uint64(1) << np.uint64(j % 64)
+        return mask
+
+    def any_null(self, columns=None):
+        """Boolean array: rows missing any of ``columns`` (default all)."""
+        if columns is None:
+            return (self.words != 0).any(axis=1)
+        return ((self.words & self.mask(columns)) != 0).any(axis=1)
+
+    def surviving(self, columns=None):
+        """Boolean array: rows complete in ``columns``, i.e. kept by ``dropna(subset=columns)``."""
+        return ~self.any_null(columns)
+
+    def survivors(self, columns=None, groups=None):
+        """Number of rows complete in ``columns``, overall or per value of ``groups``."""
+        keep = self.surviving(columns)
+        if groups is None:
+            return int(keep.sum())
+        return pd.Series(keep).groupby(np.asarray(groups)).sum()
+
+    def row_null_counts(self):
+        """Number of missing columns in each row."""
+        return popcount(self.words)
+
+    def _bit(self, j, words=None):
+        #(rows,) uint64 0/1 of column j, straight from its packed word
+        words = self.words if words is None else words
+        return (words[:, j // 64] >> np.uint64(j % 64)) & np.uint64(1)
+
+    def _counts(self, words=None):
+        words = self.words if words is None else words
+        return np.array([np.count_nonzero(self._bit(j, words)) for j in range(len(self.columns))],
+                        dtype="int64")
+
+    def column_counts(self, groups=None):
+        """Nulls per column, or a columns x groups table for a row label array."""
+        if groups is None:
+            return pd.Series(self._counts(), index=self.columns)
+        codes, uniques = pd.factorize(np.asarray(groups), sort=True)
+        counts = np.empty((len(self.columns), len(uniques)), dtype="int64")
+        for j in range(len(self.columns)):
+            #groups of the rows missing column j; rows without a group (code -1) are left out
+            hit = codes[self._bit(j) != 0]
+            counts[j] = np.bincount(hit[hit >= 0], minlength=len(uniques))
+        return pd.DataFrame(counts, index=self.columns, columns=uniques)
+
+    def columns_of(self, words):
+        """Column names whose bits are set in one row of packed ``words``."""
+        bits = np.unpackbits(np.asarray(words, dtype="uint64").view("uint8"), bitorder="little")
+        return [self.columns[j] for j in np.flatnonzero(bits[:len(self.columns)])]
+
+    def patterns(self, top=10):
+        """The most common sets of missing columns, with their row counts."""
+        view = np.ascontiguousarray(self.words).view([("w%d" % i, "uint64") for i in range(self.words.shape[1])])
+        uniques, counts = np.unique(view.ravel(), return_counts=True)
+        order = np.argsort(-counts, kind="stable")[:top]
+        return pd.DataFrame({
+            "rows": counts[order],
+            "missing": [self.columns_of(np.array(uniques[i].tolist(), dtype="uint64")) for i in order],
+        })
+
+    def drop_impact(self):
+        """Per column: nulls, and rows that are missing only that column.
+
+        ``only_missing`` is how many more rows a global ``dropna`` would keep
+        if that single column were not required.
+        """
+        single = self.words[self.row_null_counts() == 1]
+        return pd.DataFrame({"nulls": self._counts(), "only_missing": self._counts(single)},
+                            index=self.columns).sort_values("only_missing", ascending=False)
+
+    def dropna(self, frame, columns=None):
+        """Rows of ``frame`` (aligned with this bitmap) complete in ``columns``."""
+        return frame.take(np.flatnonzero(self.surviving(columns)))
@@ -0,0 +1,236 @@
+"""Outliers in the cost columns, and winsorized or trimmed versions of a frame.
+
+Section 4.2 notes that the averages are pulled by extreme cities (Sharjah
+at -5488 and Zug at +3649 disposable income). Every method here works on
+all columns at once as a ``(rows, columns)`` array:
+
+* robust z-scores, ``(x - median) / (1.4826 * MAD)``, flagged above 3.5;
+* Tukey fences, outside ``[Q1 - 1.5 IQR, Q3 + 1.5 IQR]``;
+* the same robust z-score against the city's own country (5.2), so a city
+  that is ordinary for the US but not for its neighbours still shows up.
+
+For files larger than memory, :func:`stream_outliers` builds a
+:class:`~cost_of_living.streaming.KLLSketch` per column and flags rows
+against the approximate fences in a second pass; its robust z-scores take
+one more sketch pass, over the distances from the medians, for the MAD.
+The country z-score is in-memory only.
+"""
+import numpy as np
+import pandas as pd
+
+from .groups import GroupIndex
+from .stats import cost_columns
+from .streaming import KLLSketch, iter_clean_chunks
+
+#MAD of a normal distribution is 0.6745 sigma
+MAD_SCALE = 1.4826
+
+METHODS = ("robust_z", "iqr", "country_z")
+
+
+def _values(frame, columns):
+    columns = cost_columns(frame) if columns is None else list(columns)
+    return columns, frame[columns].to_numpy(dtype="float64")
+
+
+def _scale(values, centre, spread):
+    #a column with no spread (MAD or IQR of 0) gets no score rather than inf
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(spread > 0, (values - centre) / spread, np.nan)
+
+
+def robust_z(frame, columns=None):
+    """Robust z-score of every value: distance from the column median in MADs."""
+    columns, values = _values(frame, columns)
+    median = np.nanmedian(values, axis=0)
+    mad = MAD_SCALE * np.nanmedian(np.abs(values - median), axis=0)
+    return pd.DataFrame(_scale(values, median, mad), index=frame.index, columns=columns)
+
+
+def iqr_fences(frame, columns=None, k=1.5):
+    """Quartiles and Tukey fences of each column, one row per statistic."""
+    columns, values = _values(frame, columns)
+    q1, q3 = np.nanquantile(values, [0.25, 0.75], axis=0)
+    return _fences(q1, q3, k, columns)
+
+
+def _fences(q1, q3, k, columns):
+    iqr = q3 - q1
+    return pd.DataFrame([q1, q3, q1 - k * iqr, q3 + k * iqr],
+                        index=["q1", "q3", "low", "high"], columns=columns)
+
+
+def fence_scores(frame, fences):
+    """How far each value is outside its fences, in IQRs (0 inside, NaN if missing)."""
+    columns = list(fences.columns)
+    values = frame[columns].to_numpy(dtype="float64")
+    low, high = fences.loc["low"].to_numpy(), fences.loc["high"].to_numpy()
+    iqr = (fences.loc["q3"] - fences.loc["q1"]).to_numpy()
+    outside = np.where(values < low, values - low, np.where(values > high, values - high, 0.0))
+    scores = np.where(np.isnan(values), np.nan, _scale(outside, 0.0, iqr))
+    return pd.DataFrame(scores, index=frame.index, columns=columns)
+
+
+def country_z(frame, columns=None, country="country", min_cities=5, index=None):
+    """Robust z-score of every value against the median and MAD of its country.
+
+    Countries with fewer than ``min_cities`` values in a column get no
+    score for it. ``index`` is a :class:`~cost_of_living.groups.GroupIndex`
+    of ``frame`` to reuse.
+    """
+    columns, values = _values(frame, columns)
+    if index is None:
+        index = GroupIndex.from_frame(frame, country)
+    stats = index.quantiles(frame, columns, percentiles=(0.5,))[0.5].to_numpy()
+    counts = index.counts(frame, columns).to_numpy()
+    codes = index.row_codes
+    #rows without a country look up the trailing NaN row
+    median = np.vstack([stats, np.full(len(columns), np.nan)])[codes]
+    deviations = pd.DataFrame(np.abs(values - median), columns=columns)
+    mad = MAD_SCALE * index.quantiles(deviations, columns, percentiles=(0.5,))[0.5].to_numpy()
+    mad[counts < min_cities] = np.nan
+    mad = np.vstack([mad, np.full(len(columns), np.nan)])[codes]
+    return pd.DataFrame(_scale(values, median, mad), index=frame.index, columns=columns)
+
+
+def flagged(frame, scores, threshold, labels=("city", "country")):
+    """Long table of the (row, column) pairs whose ``|score|`` exceeds ``threshold``.
+
+    One row per flagged value with the row label, ``labels`` columns,
+    column name, value and score, most extreme first.
+    """
+    score = scores.to_numpy()
+    with np.errstate(invalid="ignore"):
+        rows, cols = np.nonzero(np.abs(score) > threshold)
+    table = pd.DataFrame({"row": frame.index[rows]})
+    for label in labels:
+        if label in frame.columns:
+            table[label] = frame[label].to_numpy()[rows]
+    table["column"] = np.asarray(scores.columns)[cols]
+    table["value"] = frame[list(scores.columns)].to_numpy(dtype="float64")[rows, cols]
+    table["score"] = score[rows, cols]
+    order = np.argsort(-np.abs(table["score"].to_numpy()), kind="stable")
+    return table.iloc[order].reset_index(drop=True)
+
+
+def find_outliers(frame, columns=None, method="robust_z", threshold=None, k=1.5, **kwargs):
+    """Flagged city/column pairs of ``frame`` by one of :data:`METHODS`.
+
+    ``threshold`` defaults to 3.5 for the z-scores; for ``"iqr"`` any
+    value outside the ``k`` IQR fences is flagged. Extra keyword arguments
+    go to :func:`country_z`.
+    """
+    if method == "robust_z":
+        scores = robust_z(frame, columns)
+    elif method == "country_z":
+        scores = country_z(frame, columns, **kwargs)
+    elif method == "iqr":
+        scores = fence_scores(frame, iqr_fences(frame, columns, k))
+        threshold = 0.0 if threshold is None else threshold
+    else:
+        raise ValueError("method must be one of %s, not %r" % (", ".join(METHODS), method))
+    return flagged(frame, scores, 3.5 if threshold is None else threshold)
+
+
+def winsorize(frame, columns=None, limits=(0.01, 0.99)):
+    """Copy of ``frame`` with ``columns`` clipped to their ``limits`` quantiles."""
+    columns, values = _values(frame, columns)
+    low, high = np.nanquantile(values, limits, axis=0)
+    out = frame.copy()
+    out[columns] = np.clip(values, low, high)
+    return out
+
+
+def trim(frame, columns=None, limits=(0.01, 0.99)):
+    """Rows of ``frame`` with none of ``columns`` outside their ``limits`` quantiles."""
+    columns, values = _values(frame, columns)
+    low, high = np.nanquantile(values, limits, axis=0)
+    with np.errstate(invalid="ignore"):
+        outside = ((values < low) | (values > high)).any(axis=1)
+    return frame.take(np.flatnonzero(~outside))
+
+
+ROBUST = {"winsorize": winsorize, "trim": trim}
+
+
+def stream_fences(path, columns, chunksize=100_000, quality=1, k=1.5, sketch_k=200, seed=0,
+                  **read_csv_kwargs):
+    """Approximate :func:`iqr_fences` of the cleaned ``quality`` rows of a CSV, in one pass.
+
+    The sketches are seeded with ``seed``, so the same file gives the same fences.
+    """
+    sketches = {col: KLLSketch(sketch_k, seed) for col in columns}
+    for frame in iter_clean_chunks(path, chunksize, quality, **read_csv_kwargs):
+        for col in columns:
+            sketches[col].update(frame[col].to_numpy())
+    q1, q3 = np.array([sketches[col].quantile([0.25, 0.75]) for col in columns]).T
+    return _fences(q1, q3, k, list(columns))
+
+
+def stream_mad(path, columns, chunksize=100_000, quality=1, sketch_k=200, seed=0,
+               **read_csv_kwargs):
+    """Approximate medians and MADs of the cleaned ``quality`` rows of a CSV, in two passes.
+
+    The first pass sketches the columns for their medians, the second the
+    distances from those medians for the MADs (unscaled; :func:`mad_scores`
+    applies :data:`MAD_SCALE`). Returns a frame with rows ``median`` and ``mad``.
+    """
+    columns = list(columns)
+    sketches = {col: KLLSketch(sketch_k, seed) for col in columns}
+    for frame in iter_clean_chunks(path, chunksize, quality, **read_csv_kwargs):
+        for col in columns:
+            sketches[col].update(frame[col].to_numpy())
+    median = np.array([sketches[col].quantile(0.5) for col in columns])
+    sketches = {col: KLLSketch(sketch_k, seed) for col in columns}
+    for frame in iter_clean_chunks(path, chunksize, quality, **read_csv_kwargs):
+        for col, centre in zip(columns, median):
+            sketches[col].update(np.abs(frame[col].to_numpy(dtype="float64") - centre))
+    mad = np.array([sketches[col].quantile(0.5) for col in columns])
+    return pd.DataFrame([median, mad], index=["median", "mad"], columns=columns)
+
+
+def mad_scores(frame, centres):
+    """Robust z-score of every value against given medians and MADs (see :func:`stream_mad`)."""
+    columns = list(centres.columns)
+    values = frame[columns].to_numpy(dtype="float64")
+    median = centres.loc["median"].to_numpy()
+    mad = MAD_SCALE * centres.loc["mad"].to_numpy()
+    return pd.DataFrame(_scale(values, median, mad), index=frame.index, columns=columns)
+
+
+def stream_outliers(path, columns=None, chunksize=100_000, quality=1, k=1.5, sketch_k=200,
+                    fences=None, seed=0, method="iqr", threshold=None, **read_csv_kwargs):
+    """Outliers of a CSV too large for memory, by ``"iqr"`` or ``"robust_z"``.
+
+    For ``"iqr"`` the first pass builds approximate fences from quantile
+    sketches (:func:`stream_fences`); for ``"robust_z"`` two passes build
+    approximate medians and MADs (:func:`stream_mad`). Either is skipped
+    when ``fences`` are given, e.g. from an earlier snapshot. A last pass
+    flags values chunk by chunk, with ``threshold`` as in
+    :func:`find_outliers`. ``"country_z"`` needs every city of a country at
+    once and is only available in memory. Returns ``(flagged table, fences)``.
+    """
+    if method == "iqr":
+        threshold = 0.0 if threshold is None else threshold
+        score = fence_scores
+    elif method == "robust_z":
+        threshold = 3.5 if threshold is None else threshold
+        score = mad_scores
+    else:
+        raise ValueError("method must be iqr or robust_z when streaming, not %r" % (method,))
+    if columns is None:
+        header = pd.read_csv(path, nrows=0)
+        columns = cost_columns(header)
+    if fences is None:
+        if method == "iqr":
+            fences = stream_fences(path, columns, chunksize, quality, k, sketch_k, seed, **read_csv_kwargs)
+        else:
+            fences = stream_mad(path, columns, chunksize, quality, sketch_k, seed, **read_csv_kwargs)
+    tables = [flagged(frame, score(frame, fences), threshold)
+              for frame in iter_clean_chunks(path, chunksize, quality, **read_csv_kwargs)]
+    if not tables:
+        empty = pd.DataFrame(columns=list(columns))
+        return flagged(empty, empty, threshold), fences
+    table = pd.concat(tables, ignore_index=True)
+    order = np.argsort(-np.abs(table["score"].to_numpy()), kind="stable")
+    return table.iloc[order].reset_index(drop=True), fences
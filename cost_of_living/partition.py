@@ -0,0 +1,146 @@
+"""Split the data set by data_quality in one pass.
+
+The notebook used two ``df.loc[mask]`` selections followed by in-place
+``drop``/``dropna`` calls on them, which copies the frame several times and
+trips pandas' SettingWithCopy checks. :func:`partition_by_quality` sorts the
+quality column once and takes each partition straight out of ``df``: every
+partition frame owns its data, and with the ``"drop"`` null policy rows with
+missing values are never copied at all. The missing values per column of
+each partition are counted on the way, so the null checks of section 2.2.2
+need no frame holding those rows.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+NULL_POLICIES = ("drop", "mask")
+
+
+@dataclass
+class Partition:
+    """Rows of one data_quality value.
+
+    ``frame`` is owned by the partition (it is not a slice of the source
+    frame), so it can be modified freely. ``null_mask`` flags the rows of
+    ``frame`` with any missing value; it is ``None`` once those rows have
+    been dropped. ``rows_in``/``columns_in`` record the size of the
+    partition before any null rows or columns were removed, ``null_counts``
+    the missing values per column at that point (like ``isnull().sum()``),
+    and ``positions`` the position in the source frame of each row of
+    ``frame``.
+    """
+
+    value: object
+    frame: pd.DataFrame
+    null_mask: np.ndarray
+    rows_in: int
+    columns_in: int
+    positions: np.ndarray = None
+    null_counts: pd.Series = None
+
+    @property
+    def rows_out(self):
+        return len(self.frame)
+
+    @property
+    def shape_in(self):
+        return (self.rows_in, self.columns_in)
+
+    def dropna(self, subset=None, bitmap=None):
+        """Return a new partition without rows that have missing values.
+
+        By default these are the rows flagged in ``null_mask``. With
+        ``subset``, only missing values in those columns count, like
+        ``DataFrame.dropna(subset=...)``; pass the source frame's
+        :class:`~cost_of_living.null_bitmap.NullBitmap` as ``bitmap`` to
+        look them up there instead of scanning ``frame``.
+        """
+        if subset is None:
+            if self.null_mask is None:
+                return self
+            drop, null_mask = self.null_mask, None
+        else:
+            if bitmap is not None:
+                drop = bitmap.any_null(subset)[self.positions]
+            else:
+                drop = row_has_null(self.frame, subset)
+            null_mask = None if self.null_mask is None else self.null_mask[~drop]
+        keep = np.flatnonzero(~drop)
+        positions = None if self.positions is None else self.positions[keep]
+        return Partition(self.value, self.frame.take(keep), null_mask, self.rows_in,
+                         self.columns_in, positions, self.null_counts)
+
+
+def row_has_null(df, columns=None):
+    """Boolean array, True for rows of ``df`` with a missing value in ``columns``."""
+    columns = df.columns if columns is None else columns
+    mask = np.zeros(len(df), dtype=bool)
+    #one column at a time, so no full boolean copy of the frame is built
+    for col in columns:
+        mask |= df[col].isna().to_numpy()
+    return mask
+
+
+def partition_by_quality(df, column="data_quality", values=(1, 0), null_policy="mask",
+                         drop_column=True):
+    """Split ``df`` into one :class:`Partition` per value of ``column``.
+
+    ``null_policy`` is ``"mask"`` (keep rows with missing values and flag
+    them in ``null_mask``) or ``"drop"`` (leave them out), either for all
+    partitions or as a ``{value: policy}`` dict. With ``drop_column`` the
+    quality column itself is left out of the partition frames. Row order and
+    index labels within a partition are those of ``df``.
+
+    Returns a dict of value to partition, in the order of ``values``.
+    """
+    policies = null_policy if isinstance(null_policy, dict) else dict.fromkeys(values, null_policy)
+    for value in values:
+        if policies.get(value) not in NULL_POLICIES:
+            raise ValueError("null_policy for %r must be one of %s, got %r"
+                             % (value, NULL_POLICIES, policies.get(value)))
+
+    codes = df[column].to_numpy()
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+    bounds = [(np.searchsorted(sorted_codes, value, side="left"),
+               np.searchsorted(sorted_codes, value, side="right")) for value in values]
+    columns = [col for col in df.columns if col != column or not drop_column]
+    nulls = np.zeros(len(df), dtype=bool)
+    counts = np.zeros((len(values), len(columns)), dtype="int64")
+    #one column at a time: the row mask and each partition's count from the same isna()
+    for j, col in enumerate(columns):
+        missing = df[col].isna().to_numpy()
+        if col != column:
+            nulls |= missing
+        missing = missing[order]
+        for i, (lo, hi) in enumerate(bounds):
+            counts[i, j] = np.count_nonzero(missing[lo:hi])
+
+    partitions = {}
+    for i, (value, (lo, hi)) in enumerate(zip(values, bounds)):
+        rows = order[lo:hi]
+        rows_in = len(rows)
+        mask = nulls[rows]
+        if policies[value] == "drop":
+            rows = rows[~mask]
+            mask = None
+        #take() returns an owned frame, unlike .loc/.iloc which mark it as a copy of df
+        frame = df.take(rows)
+        if drop_column:
+            del frame[column]
+        partitions[value] = Partition(value, frame, mask, rows_in, df.shape[1], rows,
+                                      pd.Series(counts[i], index=columns))
+    return partitions
+
+
+def partition_summary(partitions):
+    """Row counts before and after null handling, one row per partition."""
+    return pd.DataFrame(
+        {
+            "rows_in": [p.rows_in for p in partitions.values()],
+            "rows_out": [p.rows_out for p in partitions.values()],
+            "rows_dropped": [p.rows_in - p.rows_out for p in partitions.values()],
+        },
+        index=pd.Index(list(partitions), name="data_quality"),
+    )
@@ -0,0 +1,222 @@
+"""Per-stage timing and memory instrumentation for the analysis pipeline.
+
+Wrap each named stage in ``with profiler.stage("name", frame) as stage:``
+and report its output with ``stage.output(result)``. An enabled
+:class:`StageProfiler` records wall and CPU time, peak traced memory
+(tracemalloc), resident memory, input/output rows and columns and the
+bytes of output columns not shared with the input, and writes one JSON
+line per stage. A disabled profiler hands out a shared no-op stage, so
+instrumented code costs next to nothing when profiling is off.
+"""
+import cProfile
+import json
+import os
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+
+def _rss():
+    """Current and peak resident set size in bytes (Linux), else ``(None, None)``."""
+    current = peak = None
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    current = int(line.split()[1]) * 1024
+                elif line.startswith("VmHWM:"):
+                    peak = int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return current, peak
+
+
+def _shape(obj):
+    if obj is None:
+        return None, None
+    if isinstance(obj, pd.DataFrame):
+        return obj.shape
+    if isinstance(obj, (pd.Series, np.ndarray)):
+        return len(obj), 1 if obj.ndim == 1 else obj.shape[1]
+    return None, None
+
+
+def _arrays(obj):
+    if isinstance(obj, pd.DataFrame):
+        return [obj[col].to_numpy() for col in obj.columns]
+    if isinstance(obj, pd.Series):
+        return [obj.to_numpy()]
+    if isinstance(obj, np.ndarray):
+        return [obj]
+    return []
+
+
+def bytes_copied(source, result):
+    """Bytes of ``result``'s arrays that do not share memory with ``source``."""
+    inputs = _arrays(source)
+    total = 0
+    for array in _arrays(result):
+        if not any(np.may_share_memory(array, other) for other in inputs):
+            total += array.nbytes
+    return total
+
+
+class _NullStage:
+    """What a disabled profiler hands out: does nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def output(self, result):
+        return result
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, profiler, name, source):
+        self.profiler = profiler
+        self.name = name
+        self.source = source
+        self.result = None
+        self.peak = 0
+
+    def output(self, result):
+        """Record ``result`` as the stage output; returns it unchanged."""
+        self.result = result
+        return result
+
+    def __enter__(self):
+        profiler = self.profiler
+        profiler._push(self)
+        self.traced_start = tracemalloc.get_traced_memory()[0]
+        self.capture = None
+        if profiler.profile_stage == self.name:
+            self.capture = profiler._start_capture()
+        self.cpu = time.process_time()
+        self.wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        profiler = self.profiler
+        if self.capture is not None:
+            profiler._stop_capture(self.capture, self.name)
+        profiler._pop(self)
+        rows_in, cols_in = _shape(self.source)
+        rows_out, cols_out = _shape(self.result)
+        rss, rss_peak = _rss()
+        record = {
+            "stage": self.name,
+            "wall_s": wall,
+            "cpu_s": cpu,
+            "peak_traced_bytes": max(self.peak - self.traced_start, 0),
+            "rss_bytes": rss,
+            "rss_peak_bytes": rss_peak,
+            "rows_in": rows_in,
+            "cols_in": cols_in,
+            "rows_out": rows_out,
+            "cols_out": cols_out,
+            "bytes_copied": bytes_copied(self.source, self.result) if self.result is not None else None,
+            "error": None if exc_type is None else exc_type.__name__,
+        }
+        profiler._record(record)
+        return False
+
+
+class StageProfiler:
+    """Collects one record per stage run; see the module docstring.
+
+    ``trace_path`` appends each record as a JSON line. ``profile_stage``
+    names one stage to run under pyinstrument (if installed, saved as
+    HTML) or cProfile (saved as a ``.prof`` stats file) in ``profile_dir``.
+    """
+
+    def __init__(self, enabled=True, trace_path=None, profile_stage=None, profile_dir="."):
+        self.enabled = enabled
+        self.trace_path = trace_path
+        self.profile_stage = profile_stage
+        self.profile_dir = profile_dir
+        self.records = []
+        self._open = []
+        self._started_tracing = False
+
+    def stage(self, name, source=None):
+        """Context manager timing the stage ``name`` working on ``source``."""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, source)
+
+    def _push(self, stage):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._update_peaks()
+        self._open.append(stage)
+
+    def _pop(self, stage):
+        self._update_peaks()
+        self._open.remove(stage)
+        if not self._open and self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _update_peaks(self):
+        #fold the peak since the last reset into every open stage, then reset
+        peak = tracemalloc.get_traced_memory()[1]
+        for stage in self._open:
+            stage.peak = max(stage.peak, peak)
+        tracemalloc.reset_peak()
+
+    def _start_capture(self):
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            capture = cProfile.Profile()
+            capture.enable()
+        else:
+            capture = Profiler()
+            capture.start()
+        return capture
+
+    def _stop_capture(self, capture, name):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        if isinstance(capture, cProfile.Profile):
+            capture.disable()
+            capture.dump_stats(os.path.join(self.profile_dir, "%s.prof" % name))
+        else:
+            capture.stop()
+            with open(os.path.join(self.profile_dir, "%s.html" % name), "w") as f:
+                f.write(capture.output_html())
+
+    def _record(self, record):
+        self.records.append(record)
+        if self.trace_path:
+            with open(self.trace_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+    def summary(self):
+        """Records as a table, totals per stage name in order of first run."""
+        if not self.records:
+            return pd.DataFrame()
+        frame = pd.DataFrame(self.records)
+        return frame.groupby("stage", sort=False).agg(
+            runs=("wall_s", "size"),
+            wall_s=("wall_s", "sum"),
+            cpu_s=("cpu_s", "sum"),
+            peak_traced_mb=("peak_traced_bytes", lambda s: s.max() / 2**20),
+            rows_in=("rows_in", "last"),
+            rows_out=("rows_out", "last"),
+            copied_mb=("bytes_copied", lambda s: s.sum() / 2**20),
+        )
+
+
+#the profiler used when none is passed: disabled
+NULL_PROFILER = StageProfiler(enabled=False)
@@ -0,0 +1,120 @@
+"""Score many cost baskets at once.
+
+A basket is a weight vector over the cost columns: the disposable income of
+a city under a basket is its salary minus the weighted sum of its costs.
+The notebook's formula is one basket (x48 + x36 + 60 x1); others swap the
+city-centre apartment for one outside the centre, add a monthly transport
+pass, and so on. All baskets are stacked into one ``(columns x baskets)``
+matrix and evaluated together as ``salary - X @ W``.
+"""
+import numpy as np
+import pandas as pd
+
+from .income import DEFAULT_FORMULA, IncomeFormula
+
+#example baskets, the first being the formula used in the notebook
+BASKETS = {
+    "notebook": DEFAULT_FORMULA,
+    "outside_centre": {"x49": 1, "x36": 1, "x1": 60},
+    "with_transport": {"x48": 1, "x36": 1, "x1": 60, "x29": 1},
+    #groceries for a month of home cooking instead of eating out
+    "home_cooked": {"x48": 1, "x36": 1, "x9": 8, "x10": 8, "x11": 2, "x12": 2, "x13": 1,
+                    "x14": 3, "x16": 2, "x19": 2, "x20": 2, "x23": 8},
+    "with_childcare": {"x48": 1, "x36": 1, "x1": 60, "x42": 1},
+    "family": {"x50": 1, "x36": 1, "x1": 120, "x29": 2, "x42": 1},
+}
+
+
+def basket_matrix(baskets, salary="x54"):
+    """Stack ``baskets`` into a weight matrix.
+
+    ``baskets`` maps a scenario name to an :class:`IncomeFormula` or a
+    ``{column: weight}`` dict. Returns ``(names, columns, W)`` with ``W`` of
+    shape ``(len(columns), len(names))``.
+    """
+    names, weights = [], []
+    for name, basket in baskets.items():
+        if isinstance(basket, IncomeFormula):
+            if basket.salary != salary:
+                raise ValueError("basket %r uses salary column %r, not %r" % (name, basket.salary, salary))
+            basket = dict(basket.costs)
+        names.append(name)
+        weights.append(basket)
+    columns = sorted({col for basket in weights for col in basket},
+                     key=lambda col: (len(col), col))
+    W = pd.DataFrame(weights, index=names, columns=columns).fillna(0.0).to_numpy(dtype="float64").T
+    return names, columns, W
+
+
+def _scores(frame, salary, columns, W):
+    X = np.column_stack([frame[col].to_numpy(dtype="float64") for col in columns])
+    missing = np.isnan(X)
+    scores = frame[salary].to_numpy(dtype="float64")[:, None] - np.where(missing, 0.0, X) @ W
+    #a missing cost only matters to the baskets that use that column
+    if missing.any():
+        scores[(missing.astype("float64") @ (W != 0)) > 0] = np.nan
+    return scores
+
+
+class ScenarioResult:
+    """Disposable income of every city under every basket.
+
+    ``scores`` is a ``cities x scenarios`` frame indexed like the input.
+    """
+
+    def __init__(self, scores, cities, countries):
+        self.scores = scores
+        self.cities = cities
+        self.countries = countries
+
+    def ranks(self, ascending=False):
+        """Rank of each city within each scenario, 1 being the highest income."""
+        return self.scores.rank(ascending=ascending, method="min")
+
+    def summary(self):
+        """Mean, median, std and share of negative incomes per scenario."""
+        values = self.scores.to_numpy()
+        with np.errstate(invalid="ignore"):
+            negative = np.nanmean(np.where(np.isnan(values), np.nan, values < 0), axis=0)
+        return pd.DataFrame({
+            "cities": np.sum(~np.isnan(values), axis=0),
+            "mean": np.nanmean(values, axis=0),
+            "median": np.nanmedian(values, axis=0),
+            "std": np.nanstd(values, axis=0, ddof=1),
+            "share_negative": negative,
+        }, index=self.scores.columns)
+
+    def extremes(self, k=5, which="lowest"):
+        """The ``k`` lowest or highest cities per scenario, in long form."""
+        values = self.scores.to_numpy()
+        filled = np.where(np.isnan(values), np.inf if which == "lowest" else -np.inf, values)
+        key = filled if which == "lowest" else -filled
+        k = min(k, len(values))
+        if k:
+            #argpartition per column, then sort only the k survivors
+            part = np.argpartition(key, k - 1, axis=0)[:k]
+            order = np.take_along_axis(part, np.argsort(np.take_along_axis(key, part, axis=0), axis=0,
+                                                        kind="stable"), axis=0)
+            rows = order.T.ravel()
+        else:
+            rows = np.empty(0, dtype="int64")
+        return pd.DataFrame({
+            "scenario": np.repeat(self.scores.columns.to_numpy(), k),
+            "rank": np.tile(np.arange(1, k + 1), values.shape[1]),
+            "label": self.scores.index.to_numpy()[rows],
+            "city": self.cities[rows],
+            "country": self.countries[rows],
+            "disposable_income": values[rows, np.repeat(np.arange(values.shape[1]), k)],
+        })
+
+
+def score_scenarios(frame, baskets=BASKETS, salary="x54", dtype="float64"):
+    """Evaluate every basket for every row of ``frame`` in one matrix product.
+
+    ``dtype="float32"`` halves the memory of the result, which is
+    ``rows x baskets``, for large runs.
+    """
+    names, columns, W = basket_matrix(baskets, salary)
+    scores = _scores(frame, salary, columns, W).astype(dtype, copy=False)
+    return ScenarioResult(pd.DataFrame(scores, index=frame.index, columns=names),
+                          frame["city"].to_numpy(), frame["country"].to_numpy())
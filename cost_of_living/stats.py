@@ -0,0 +1,155 @@
+"""Correlation and regression of the salary (x54) against every cost column.
+
+Section 3.2 judges the relationship between x54 and a handful of costs from
+scatter plots. :func:`correlate` measures it for all the x columns at once:
+Pearson and Spearman correlation and the OLS fit ``target = intercept +
+slope * column``, each computed as column-wise reductions over one
+``(rows x columns)`` array. Missing values are handled pairwise: each column
+uses the rows where both it and the target are present, so no rows need to
+be dropped beforehand.
+"""
+import numpy as np
+import pandas as pd
+
+
+def cost_columns(frame, exclude=()):
+    """The ``x1 ... x55`` columns of ``frame`` in numeric order."""
+    cols = [col for col in frame.columns
+            if isinstance(col, str) and col[:1] == "x" and col[1:].isdigit() and col not in exclude]
+    return sorted(cols, key=lambda col: int(col[1:]))
+
+
+def _pairwise(X, y):
+    """Validity mask and target broadcast to the shape of ``X``."""
+    valid = ~np.isnan(X) & ~np.isnan(y)[:, None]
+    Y = np.broadcast_to(y[:, None], X.shape)
+    return valid, Y
+
+
+def _moments(X, Y, valid):
+    """Pairwise count, means and centred (co)variance sums per column."""
+    n = valid.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mx = np.where(valid, X, 0.0).sum(axis=0) / n
+        my = np.where(valid, Y, 0.0).sum(axis=0) / n
+    Xc = np.where(valid, X - mx, 0.0)
+    Yc = np.where(valid, Y - my, 0.0)
+    return n, mx, my, (Xc * Xc).sum(axis=0), (Yc * Yc).sum(axis=0), (Xc * Yc).sum(axis=0)
+
+
+def _pearson(sxx, syy, sxy):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sxy / np.sqrt(sxx * syy)
+
+
+def _tie_bounds(sorted_values, axis_len):
+    """First and last sorted position of the run of equal values at each position."""
+    positions = np.arange(axis_len).reshape((-1,) + (1,) * (sorted_values.ndim - 1))
+    new_run = np.ones(sorted_values.shape, dtype=bool)
+    new_run[1:] = sorted_values[1:] != sorted_values[:-1]
+    run_end = np.ones(sorted_values.shape, dtype=bool)
+    run_end[:-1] = new_run[1:]
+    first = np.maximum.accumulate(np.where(new_run, positions, 0), axis=0)
+    last = np.minimum.accumulate(np.where(run_end, positions, axis_len - 1)[::-1], axis=0)[::-1]
+    return first, last
+
+
+def _ranks(values, valid):
+    """Average ranks of each column over that column's valid rows only."""
+    #column-major, so each column is sorted in contiguous memory
+    masked = np.asfortranarray(np.where(valid, values, np.nan))
+    #NaN sorts last, so the valid rows of a column take sorted positions 0 .. n-1
+    order = np.argsort(masked, axis=0)
+    first, last = _tie_bounds(np.take_along_axis(masked, order, axis=0), len(masked))
+    ranks = np.empty_like(masked)
+    np.put_along_axis(ranks, order, (first + last) / 2 + 1, axis=0)
+    return ranks
+
+
+def _target_ranks(y, valid):
+    """Average ranks of ``y`` over the valid rows of every column.
+
+    ``y`` is sorted once; the rank within a column is then the running
+    count of that column's valid rows, averaged over runs of tied values.
+    """
+    order = np.argsort(y, kind="stable")
+    first, last = _tie_bounds(y[order], len(y))
+    seen = np.cumsum(valid[order], axis=0)
+    before = seen[first] - valid[order][first]
+    ranks = np.empty(valid.shape)
+    ranks[order] = (before + 1 + seen[last]) / 2
+    return ranks
+
+
+def _bootstrap(X, Y, valid, mx, my, resamples, confidence, seed, batch=256):
+    """Percentile intervals of Pearson r and the OLS slope over resamples.
+
+    Each resample is a vector of multinomial row counts, so the weighted
+    sums of a whole batch of resamples are a single matrix product.
+    """
+    rng = np.random.default_rng(seed)
+    n_rows = X.shape[0]
+    #centring on the full-sample means keeps the raw sums well conditioned
+    Xc = np.where(valid, X - mx, 0.0)
+    Yc = np.where(valid, Y - my, 0.0)
+    W = valid.astype("float64")
+    terms = [W, Xc, Yc, Xc * Xc, Yc * Yc, Xc * Yc]
+    r, slope = [], []
+    for start in range(0, resamples, batch):
+        size = min(batch, resamples - start)
+        counts = rng.multinomial(n_rows, np.full(n_rows, 1.0 / n_rows), size=size).astype("float64")
+        n, sx, sy, sxx, syy, sxy = (counts @ term for term in terms)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            vx = sxx - sx * sx / n
+            vy = syy - sy * sy / n
+            cov = sxy - sx * sy / n
+            r.append(cov / np.sqrt(vx * vy))
+            slope.append(cov / vx)
+    alpha = (1 - confidence) / 2
+    quantiles = [alpha * 100, (1 - alpha) * 100]
+    r_low, r_high = np.nanpercentile(np.vstack(r), quantiles, axis=0)
+    s_low, s_high = np.nanpercentile(np.vstack(slope), quantiles, axis=0)
+    return r_low, r_high, s_low, s_high
+
+
+def correlate(frame, target="x54", columns=None, bootstrap=0, confidence=0.95, seed=0,
+              descriptions=None):
+    """Correlation and OLS fit of ``target`` against each of ``columns``.
+
+    ``columns`` defaults to every x column except ``target``. With
+    ``bootstrap`` > 0, percentile confidence intervals for Pearson r and
+    the slope are added from that many resamples. ``descriptions`` (e.g.
+    the ``Description`` column of Table.csv) adds a readable name.
+
+    Returns one row per column, ranked by the absolute Pearson correlation.
+    """
+    if columns is None:
+        columns = cost_columns(frame, exclude=(target,))
+    columns = list(columns)
+    X = np.column_stack([frame[col].to_numpy(dtype="float64") for col in columns])
+    y = frame[target].to_numpy(dtype="float64")
+    valid, Y = _pairwise(X, y)
+
+    n, mx, my, sxx, syy, sxy = _moments(X, Y, valid)
+    pearson = _pearson(sxx, syy, sxy)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = sxy / sxx
+    intercept = my - slope * mx
+
+    rx, ry = _ranks(X, valid), _target_ranks(y, valid)
+    _, _, _, rxx, ryy, rxy = _moments(rx, ry, valid)
+    spearman = _pearson(rxx, ryy, rxy)
+
+    result = pd.DataFrame(
+        {"n": n, "pearson": pearson, "spearman": spearman, "slope": slope,
+         "intercept": intercept, "r2": pearson ** 2},
+        index=pd.Index(columns, name="column"),
+    )
+    if bootstrap:
+        r_low, r_high, s_low, s_high = _bootstrap(X, Y, valid, mx, my, bootstrap, confidence, seed)
+        result["pearson_low"], result["pearson_high"] = r_low, r_high
+        result["slope_low"], result["slope_high"] = s_low, s_high
+    if descriptions is not None:
+        result.insert(0, "description", pd.Series(descriptions).reindex(result.index))
+    order = np.argsort(-np.abs(result["pearson"].to_numpy()), kind="stable")
+    return result.iloc[order]
@@ -0,0 +1,182 @@
+"""Memory-mapped columnar store of cost of living snapshots.
+
+A store is a directory with one raw binary file per column and a
+manifest.json. Numeric columns are written as they are; city and country
+are dictionary encoded (int32 codes on disk, the dictionary in the
+manifest). Each appended snapshot is a segment whose rows are grouped by
+data_quality, and the manifest records where each data_quality value starts
+and stops, so a partition is a contiguous slice of every column file.
+
+Columns are opened with ``np.memmap`` in read-only mode: slices are views
+of the file, and processes that open the same store share its pages through
+the OS page cache instead of each holding a parsed copy. Appending a
+snapshot only writes to the end of the column files.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .loader import decode_dictionary, encode_dictionary, load_cost_of_living
+
+_MANIFEST = "manifest.json"
+
+#columns stored as dictionary codes, and what they decode to
+DICTIONARY_COLUMNS = {"city": "object", "country": "category"}
+
+
+class ColumnStore:
+    """A directory of memory-mapped columns, appended to one snapshot at a time."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, _MANIFEST)) as f:
+            self.manifest = json.load(f)
+        self._arrays = {}
+
+    @classmethod
+    def create(cls, directory, frame=None, segment=None):
+        """Create an empty store in ``directory``, optionally with a first snapshot."""
+        os.makedirs(directory, exist_ok=True)
+        _write_manifest(directory, {"rows": 0, "columns": {}, "segments": []})
+        store = cls(directory)
+        if frame is not None:
+            store.append(frame, segment)
+        return store
+
+    @classmethod
+    def from_csv(cls, directory, path, schema=None, segment=None):
+        """Create a store from a CSV read with the typed loader's schema."""
+        frame = load_cost_of_living(path, columns="all", schema=schema, cache_dir=False)
+        return cls.create(directory, frame, segment or os.path.basename(path))
+
+    def __getstate__(self):
+        #memmaps are reopened in the receiving process, which shares the pages
+        return {"directory": self.directory, "manifest": self.manifest, "_arrays": {}}
+
+    def __len__(self):
+        return self.manifest["rows"]
+
+    @property
+    def columns(self):
+        return list(self.manifest["columns"])
+
+    @property
+    def segments(self):
+        return [segment["name"] for segment in self.manifest["segments"]]
+
+    def array(self, column):
+        """The whole column as a read-only memory-mapped array (dictionary codes for city/country)."""
+        array = self._arrays.get(column)
+        if array is None:
+            entry = self.manifest["columns"][column]
+            if len(self) == 0:
+                array = np.empty(0, dtype=entry["storage"])
+            else:
+                array = np.memmap(os.path.join(self.directory, entry["file"]),
+                                  dtype=entry["storage"], mode="r", shape=(len(self),))
+                #plain ndarray view: the mapping stays alive as its base
+                array = array.view(np.ndarray)
+            self._arrays[column] = array
+        return array
+
+    def dictionary(self, column):
+        return self.manifest["columns"][column]["values"]
+
+    def _segment(self, segment):
+        if isinstance(segment, int):
+            return self.manifest["segments"][segment]
+        for entry in self.manifest["segments"]:
+            if entry["name"] == segment:
+                return entry
+        raise KeyError(segment)
+
+    def bounds(self, segment=None, quality=None):
+        """``(start, stop)`` of a segment (default: the latest) or of one of its partitions."""
+        if not self.manifest["segments"]:
+            return 0, 0
+        entry = self._segment(-1 if segment is None else segment)
+        if quality is None:
+            return entry["start"], entry["stop"]
+        return tuple(entry["partitions"].get(str(int(quality)), (entry["stop"], entry["stop"])))
+
+    def values(self, column, segment=None, quality=None):
+        """Zero-copy view of ``column`` for a segment or partition (codes for city/country)."""
+        start, stop = self.bounds(segment, quality)
+        return self.array(column)[start:stop]
+
+    def frame(self, columns=None, segment=None, quality=None):
+        """DataFrame of ``columns`` for a segment or one of its data_quality partitions.
+
+        Numeric columns wrap the memmap without copying (pandas marks them
+        read-only); city and country are decoded from their codes.
+        """
+        columns = self.columns if columns is None else list(columns)
+        start, stop = self.bounds(segment, quality)
+        data = {}
+        for col in columns:
+            values = self.array(col)[start:stop]
+            if col in DICTIONARY_COLUMNS:
+                values = decode_dictionary(values, self.dictionary(col), DICTIONARY_COLUMNS[col])
+            data[col] = values
+        return pd.DataFrame(data, columns=columns, copy=False)
+
+    def append(self, frame, segment=None):
+        """Add ``frame`` as a new segment; existing column files are only extended.
+
+        The first snapshot fixes the columns and their dtypes; later ones are
+        cast to them. Rows are grouped by data_quality (stable, so the order
+        within a partition is the file order).
+        """
+        if segment is None:
+            segment = "segment-%d" % len(self.manifest["segments"])
+        if segment in self.segments:
+            raise ValueError("segment %r already in the store" % segment)
+        if not self.manifest["columns"]:
+            self.manifest["columns"] = {col: _entry(col, frame[col]) for col in frame.columns}
+        missing = [col for col in self.columns if col not in frame.columns]
+        if missing:
+            raise ValueError("snapshot is missing columns: %s" % ", ".join(missing))
+
+        start = len(self)
+        partitions = {}
+        order = np.arange(len(frame))
+        if "data_quality" in frame.columns:
+            quality = frame["data_quality"].to_numpy()
+            order = np.argsort(quality, kind="stable")
+            values, firsts = np.unique(quality[order], return_index=True)
+            stops = list(firsts[1:]) + [len(frame)]
+            partitions = {str(int(v)): [start + int(lo), start + int(hi)]
+                          for v, lo, hi in zip(values, firsts, stops)}
+
+        for col, entry in self.manifest["columns"].items():
+            series = frame[col]
+            if col in DICTIONARY_COLUMNS:
+                values = encode_dictionary(series, entry["values"])
+            else:
+                values = series.to_numpy(dtype=entry["storage"])
+            with open(os.path.join(self.directory, entry["file"]), "ab") as f:
+                #drop anything a failed append left past the last recorded row
+                f.truncate(start * np.dtype(entry["storage"]).itemsize)
+                np.ascontiguousarray(values[order]).tofile(f)
+
+        self.manifest["segments"].append({"name": segment, "start": start,
+                                          "stop": start + len(frame), "partitions": partitions})
+        self.manifest["rows"] = start + len(frame)
+        _write_manifest(self.directory, self.manifest)
+        self._arrays = {}
+        return self
+
+
+def _entry(column, series):
+    if column in DICTIONARY_COLUMNS:
+        return {"file": column + ".bin", "storage": "int32", "values": []}
+    return {"file": column + ".bin", "storage": str(series.dtype)}
+
+
+def _write_manifest(directory, manifest):
+    path = os.path.join(directory, _MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(path + ".tmp", path)
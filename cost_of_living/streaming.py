@@ -0,0 +1,317 @@
+"""Chunked version of the DataProg pipeline for files larger than memory.
+
+The CSV is read ``chunksize`` rows at a time and each chunk goes through the
+same stages as the notebook: split by data_quality, drop the data_quality
+column, drop rows with missing values and compute disposable income. Only
+running aggregates are kept between chunks, so memory is bounded by the
+chunk size (plus one counter entry per country).
+"""
+import heapq
+import math
+from collections import Counter
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from .income import DEFAULT_FORMULA, disposable_income
+from .partition import partition_by_quality
+
+
+class KLLSketch:
+    """Mergeable approximate quantiles in bounded memory (Karnin, Lang, Liberty).
+
+    Values are kept in levels of compactors: an item at level ``h`` stands
+    for ``2**h`` values. A level over its capacity is sorted and every
+    other item (from a random start) moves up a level. Memory is
+    ``O(k log(n / k))`` and the rank error roughly ``1.7 / k`` (about 1%
+    for the default ``k``). Sketches of chunks or files can be merged.
+    """
+
+    def __init__(self, k=200, seed=None):
+        self.k = k
+        self.count = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        values = np.asarray(values, dtype="float64")
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self.count += len(values)
+            self._compress()
+        return self
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            items = self.levels[h]
+            if len(items) <= self._capacity(h):
+                h += 1
+                continue
+            if h + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(items)
+            #an odd item out stays at this level
+            stay, items = items[:len(items) % 2], items[len(items) % 2:]
+            promoted = items[self._rng.integers(2)::2]
+            self.levels[h] = stay
+            self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+            #a new top level lowers the capacity of every level below it
+            h = 0
+
+    def quantile(self, q):
+        """Approximate ``q`` quantile(s), NaN for an empty sketch."""
+        q = np.asarray(q, dtype="float64")
+        if not self.count:
+            return np.full(q.shape, np.nan) if q.ndim else math.nan
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        items, cumulative = items[order], np.cumsum(weights[order])
+        index = np.searchsorted(cumulative, q * cumulative[-1], side="left")
+        result = items[np.minimum(index, len(items) - 1)]
+        return result if q.ndim else float(result)
+
+
+class RunningDescribe:
+    """Mergeable count/mean/std/min/max, the moments part of ``describe()``.
+
+    Uses the pairwise update of Chan et al., so chunks can be added in any
+    order and partial results from several workers merged. With
+    ``percentiles``, a :class:`KLLSketch` of the values also gives those
+    (approximate) percentiles, as the ``25%``/``50%``/``75%`` rows of
+    ``describe()``; the sketch's ``seed`` makes them the same on every run.
+    """
+
+    def __init__(self, percentiles=None, sketch_k=200, seed=0):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.percentiles = tuple(percentiles) if percentiles else ()
+        self.seed = seed
+        self.sketch = KLLSketch(sketch_k, seed) if self.percentiles else None
+
+    def update(self, values):
+        values = np.asarray(values, dtype="float64")
+        values = values[~np.isnan(values)]
+        if self.sketch is not None:
+            self.sketch.update(values)
+        if len(values):
+            other = RunningDescribe()
+            other.count = len(values)
+            other.mean = float(values.mean())
+            other.m2 = float(((values - other.mean) ** 2).sum())
+            other.min = float(values.min())
+            other.max = float(values.max())
+            self._merge_moments(other)
+        return self
+
+    def merge(self, other):
+        """Fold ``other`` in; both must keep percentiles or neither (unless one is empty).
+
+        A side without a sketch has not kept its values, so they could not
+        be added to the other's percentiles.
+        """
+        if not other.count:
+            return self
+        if (self.sketch is None) != (other.sketch is None):
+            if self.count:
+                raise ValueError("cannot merge a RunningDescribe %s percentiles into one %s them"
+                                 % (("with", "without") if self.sketch is None else ("without", "with")))
+            #an empty side takes on the other's percentiles
+            self.percentiles = other.percentiles
+            self.sketch = KLLSketch(other.sketch.k, self.seed) if other.sketch is not None else None
+        if self.sketch is not None:
+            self.sketch.merge(other.sketch)
+        return self._merge_moments(other)
+
+    def _merge_moments(self, other):
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def std(self):
+        #sample standard deviation, as pandas
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else math.nan
+
+    def to_series(self, name=None):
+        if not self.count:
+            stats = {"count": 0.0, "mean": math.nan, "std": math.nan, "min": math.nan}
+        else:
+            stats = {"count": float(self.count), "mean": self.mean, "std": self.std, "min": self.min}
+        #percentiles sit between min and max, as in describe()
+        for q in self.percentiles:
+            stats["%g%%" % (q * 100)] = self.sketch.quantile(q) if self.count else math.nan
+        stats["max"] = self.max if self.count else math.nan
+        return pd.Series(stats, name=name)
+
+
+class TopK:
+    """The ``k`` smallest and largest values seen so far, with their rows.
+
+    Ties are broken by row label, the first one winning, as in
+    ``nsmallest``/``nlargest`` with ``keep="first"``.
+    """
+
+    def __init__(self, k=5):
+        self.k = k
+        self.smallest = []
+        self.largest = []
+
+    def update(self, values, labels, payload):
+        """Add ``values`` with their row ``labels`` and a list of payload tuples."""
+        values = np.asarray(values, dtype="float64")
+        valid = np.flatnonzero(~np.isnan(values))
+        if not len(valid):
+            return self
+        #only the chunk's own top k can make it into the global top k
+        k = min(self.k, len(valid))
+        low = valid[np.argpartition(values[valid], k - 1)[:k]] if k < len(valid) else valid
+        high = valid[np.argpartition(values[valid], len(valid) - k)[len(valid) - k:]] if k < len(valid) else valid
+        # argpartition does not break ties by position, so widen to every row equal to the cut
+        low = np.union1d(low, valid[values[valid] <= values[low].max()])
+        high = np.union1d(high, valid[values[valid] >= values[high].min()])
+        self._merge([(values[i], labels[i], payload[i]) for i in low],
+                    [(values[i], labels[i], payload[i]) for i in high])
+        return self
+
+    def merge(self, other):
+        self._merge(other.smallest, other.largest)
+        return self
+
+    def _merge(self, smallest, largest):
+        self.smallest = heapq.nsmallest(self.k, self.smallest + smallest,
+                                        key=lambda item: (item[0], item[1]))
+        self.largest = heapq.nsmallest(self.k, self.largest + largest,
+                                       key=lambda item: (-item[0], item[1]))
+
+
+@dataclass
+class StreamResult:
+    """Running aggregates collected by :func:`stream_analysis`."""
+
+    k: int = 5
+    column: str = "disposable_income"
+    describe: dict = field(default_factory=dict)
+    country_counts: Counter = field(default_factory=Counter)
+    quality_country_counts: dict = field(default_factory=dict)
+    rows_in: Counter = field(default_factory=Counter)
+    rows_out: Counter = field(default_factory=Counter)
+    top: TopK = None
+
+    def __post_init__(self):
+        if self.top is None:
+            self.top = TopK(self.k)
+
+    def merge(self, other):
+        """Fold another partial result (e.g. from another file) into this one."""
+        for name, desc in other.describe.items():
+            if name not in self.describe:
+                self.describe[name] = RunningDescribe(desc.percentiles,
+                                                      desc.sketch.k if desc.sketch else 200, desc.seed)
+            self.describe[name].merge(desc)
+        self.country_counts.update(other.country_counts)
+        for value, counts in other.quality_country_counts.items():
+            self.quality_country_counts.setdefault(value, Counter()).update(counts)
+        self.rows_in.update(other.rows_in)
+        self.rows_out.update(other.rows_out)
+        self.top.merge(other.top)
+        return self
+
+    def describe_frame(self):
+        return pd.DataFrame({name: desc.to_series() for name, desc in self.describe.items()})
+
+    def value_counts(self, quality=None):
+        """Country counts like ``value_counts()``: raw data, or one cleaned partition."""
+        counts = self.country_counts if quality is None else self.quality_country_counts.get(quality, {})
+        series = pd.Series(dict(counts), dtype="int64", name="count")
+        series.index.name = "country"
+        #value_counts order: descending count, ties in order of first appearance
+        return series.sort_values(ascending=False, kind="stable")
+
+    def nsmallest(self):
+        return self._frame(self.top.smallest)
+
+    def nlargest(self):
+        return self._frame(self.top.largest)
+
+    def _frame(self, items):
+        return pd.DataFrame([(city, country, value) for value, _, (city, country) in items],
+                            index=[label for _, label, _ in items],
+                            columns=["city", "country", self.column])
+
+
+def iter_clean_chunks(path, chunksize=100_000, quality=1, formula=DEFAULT_FORMULA,
+                      stats=None, **read_csv_kwargs):
+    """Yield cleaned chunks of ``quality`` rows with a disposable_income column.
+
+    Extra keyword arguments go to ``pd.read_csv`` (``dtype``, ``usecols``,
+    ...). Index labels continue across chunks, as in the whole file. When
+    ``stats`` (a :class:`StreamResult`) is given, row and country counts for
+    every data_quality value are recorded in it as the chunks go by.
+    """
+    with pd.read_csv(path, chunksize=chunksize, **read_csv_kwargs) as reader:
+        for chunk in reader:
+            values = (1, 0) if stats is not None else (quality,)
+            partitions = partition_by_quality(chunk, values=values, null_policy="drop")
+            if stats is not None:
+                stats.country_counts.update(_counts(chunk["country"]))
+                for value, part in partitions.items():
+                    stats.rows_in[value] += part.rows_in
+                    stats.rows_out[value] += part.rows_out
+                    stats.quality_country_counts.setdefault(value, Counter()).update(
+                        _counts(part.frame["country"]))
+            frame = partitions[quality].frame
+            frame["disposable_income"] = disposable_income(frame, formula)
+            yield frame
+
+
+def _counts(series):
+    #value_counts keeps first-appearance order for ties, Counter.update preserves it
+    return series.value_counts(sort=False).to_dict()
+
+
+def stream_analysis(path, chunksize=100_000, quality=1, k=5, formula=DEFAULT_FORMULA,
+                    columns=("x54", "disposable_income"), percentiles=None, seed=0, **read_csv_kwargs):
+    """Run the cleaning and disposable income stages over ``path`` in chunks.
+
+    Returns a :class:`StreamResult` with a mergeable ``describe()`` of
+    ``columns`` (with approximate ``percentiles`` if given, from sketches
+    seeded with ``seed``), per-country counts (raw and per cleaned
+    partition), row counts before and after dropping nulls, and the ``k``
+    cities with the lowest and highest disposable income.
+    """
+    result = StreamResult(k=k)
+    for name in columns:
+        result.describe[name] = RunningDescribe(percentiles, seed=seed)
+    for frame in iter_clean_chunks(path, chunksize, quality, formula, stats=result,
+                                   **read_csv_kwargs):
+        for name in columns:
+            result.describe[name].update(frame[name].to_numpy())
+        labels = frame.index.to_numpy()
+        payload = list(zip(frame["city"], frame["country"]))
+        result.top.update(frame["disposable_income"].to_numpy(), labels, payload)
+    return result
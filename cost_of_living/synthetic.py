@@ -0,0 +1,109 @@
+"""Synthetic data sets with the Cost_of_living_v2 layout, for benchmarks.
+
+:func:`generate_cost_of_living` builds any number of city rows with the
+columns of Table.csv (city, country, x1 ... x55, data_quality) and the
+broad shape of the Numbeo data:
+
+* a skewed country distribution, with the United States holding about a
+  quarter of the cities as noted in section 5.2;
+* salaries (x54) that are log-normal around a per-country level;
+* prices that scale with the local salary, each with its own elasticity,
+  so every column correlates with x54 to a realistic degree;
+* missing values per column, heaviest for x40, x53, x52, x29 and x43, and
+  much rarer in rows with data_quality 1 (about a fifth of the rows).
+"""
+import numpy as np
+import pandas as pd
+
+X_COLUMNS = ["x%d" % i for i in range(1, 56)]
+
+#typical price (USD) and elasticity to the local salary of each column
+_PRICE = {
+    "x1": (10, 0.6), "x2": (45, 0.6), "x3": (7, 0.4), "x4": (3, 0.5), "x5": (4, 0.4),
+    "x6": (3, 0.5), "x7": (1.5, 0.4), "x8": (1.2, 0.4), "x9": (1.1, 0.3), "x10": (1.8, 0.4),
+    "x11": (2, 0.3), "x12": (3, 0.4), "x13": (9, 0.4), "x14": (8, 0.4), "x15": (11, 0.4),
+    "x16": (2.5, 0.4), "x17": (1.6, 0.3), "x18": (2.2, 0.4), "x19": (2.3, 0.4), "x20": (1.4, 0.3),
+    "x21": (1.4, 0.3), "x22": (1.3, 0.5), "x23": (1, 0.3), "x24": (9, 0.3), "x25": (1.8, 0.4),
+    "x26": (2.5, 0.3), "x27": (6, 0.5), "x28": (1.5, 0.6), "x29": (45, 0.7), "x30": (3, 0.5),
+    "x31": (1.2, 0.5), "x32": (15, 0.6), "x33": (1.3, 0.2), "x34": (24000, 0.1), "x35": (23000, 0.1),
+    "x36": (140, 0.5), "x37": (0.1, 0.4), "x38": (40, 0.3), "x39": (35, 0.5), "x40": (15, 0.5),
+    "x41": (10, 0.4), "x42": (450, 0.7), "x43": (9000, 0.6), "x44": (60, 0.2), "x45": (35, 0.2),
+    "x46": (80, 0.1), "x47": (100, 0.3), "x48": (800, 0.8), "x49": (620, 0.8), "x50": (1400, 0.8),
+    "x51": (1100, 0.8), "x52": (3500, 0.8), "x53": (2500, 0.8), "x55": (6, -0.3),
+}
+
+#share of missing values in data_quality 0 rows (section 2.2.2.1)
+_NULL_RATE = {"x40": 0.59, "x53": 0.56, "x52": 0.55, "x29": 0.53, "x43": 0.40}
+_DEFAULT_NULL_RATE = 0.08
+#missing values are this much rarer in data_quality 1 rows
+_GOOD_NULL_FACTOR = 0.05
+#in data_quality 0 rows gaps cluster: this share of rows is nearly complete
+_COMPLETE_SHARE = 0.15
+_COMPLETE_NULL_FACTOR = 0.02
+
+_TOP_COUNTRIES = [("United States", 0.24), ("Italy", 0.041), ("India", 0.037), ("Brazil", 0.036),
+                  ("United Kingdom", 0.036), ("Germany", 0.03), ("France", 0.028), ("Spain", 0.025),
+                  ("Canada", 0.02), ("Mexico", 0.02)]
+_MEDIAN_SALARY = 1400.0
+
+
+def country_weights(n_countries=200):
+    """Country names and sampling weights: a few large ones, then a Zipf tail."""
+    names = [name for name, _ in _TOP_COUNTRIES]
+    weights = [share for _, share in _TOP_COUNTRIES]
+    tail = n_countries - len(names)
+    zipf = 1.0 / np.arange(len(names) + 1, len(names) + tail + 1) ** 1.1
+    zipf *= (1 - sum(weights)) / zipf.sum()
+    names += ["Country %03d" % i for i in range(tail)]
+    return names, np.concatenate([weights, zipf])
+
+
+def generate_cost_of_living(n_rows, seed=0, good_share=0.2, n_countries=200,
+                            null_rates=None, dtype="float64"):
+    """Synthetic frame with ``n_rows`` cities in the Cost_of_living_v2 layout.
+
+    ``null_rates`` overrides the share of missing values per column (in
+    data_quality 0 rows). ``dtype`` is the dtype of the x columns; use
+    float32 to halve memory at 10M rows.
+    """
+    rng = np.random.default_rng(seed)
+    names, weights = country_weights(n_countries)
+    country_codes = rng.choice(len(names), size=n_rows, p=weights)
+    #each country gets its own salary level, the biggest ones fixed to be rich-ish
+    level = rng.normal(0.0, 0.8, len(names))
+    level[0] = 0.9
+    log_salary = np.log(_MEDIAN_SALARY) + level[country_codes] + rng.normal(0.0, 0.35, n_rows)
+    quality = (rng.random(n_rows) < good_share).astype("int8")
+    rates = dict(_NULL_RATE, **(null_rates or {}))
+    #per-row scale of the null rates, keeping each column's overall rate in bad rows
+    complete = rng.random(n_rows) < _COMPLETE_SHARE
+    sparse = (1 - _COMPLETE_SHARE * _COMPLETE_NULL_FACTOR) / (1 - _COMPLETE_SHARE)
+    row_factor = np.where(quality == 1, _GOOD_NULL_FACTOR,
+                          np.where(complete, _COMPLETE_NULL_FACTOR, sparse))
+
+    data = {
+        "city": pd.Series(np.char.add("City ", np.arange(n_rows).astype(str)), dtype=object),
+        "country": pd.Categorical.from_codes(country_codes, categories=names),
+    }
+    relative = log_salary - np.log(_MEDIAN_SALARY)
+    for col in X_COLUMNS:
+        if col == "x54":
+            values = np.exp(log_salary)
+        else:
+            price, elasticity = _PRICE[col]
+            values = price * np.exp(elasticity * relative + rng.normal(0.0, 0.25, n_rows))
+        values = np.round(values, 2).astype(dtype)
+        rate = rates.get(col, _DEFAULT_NULL_RATE)
+        missing = rng.random(n_rows) < rate * row_factor
+        values[missing] = np.nan
+        data[col] = values
+    data["data_quality"] = quality
+    frame = pd.DataFrame(data)
+    frame["country"] = frame["country"].astype(object)
+    return frame
+
+
+def write_table_csv(path):
+    """Write a Table.csv column map matching the synthetic layout."""
+    columns = ["city", "country"] + X_COLUMNS + ["data_quality"]
+    pd.DataFrame({"Column": columns, "Description": columns}).to_csv(path, index=False)
@@ -0,0 +1,70 @@
+"""Column-wise check that a frame holds only numeric data.
+
+The notebook ran ``applymap(is_numeric)``, one ``float()`` call per cell.
+:func:`numeric_report` gives the same answer from the dtypes and a
+vectorized ``pd.to_numeric(errors="coerce")``; only the few values that the
+coercion rejects but ``float()`` might still accept (such as ``"nan"`` or
+``"inf"``) are checked one by one with :func:`is_numeric`.
+"""
+import numpy as np
+import pandas as pd
+
+#the syntax float() accepts for strings
+_DIGITS = r"\d(?:_?\d)*"
+_FLOAT_SYNTAX = r"\s*[+-]?(?:(?:{d}\.?(?:{d})?|\.{d})(?:[eE][+-]?{d})?|inf(?:inity)?|nan)\s*".format(d=_DIGITS)
+
+
+def is_numeric(value):
+    """Reference per-value check from section 2.2.1 of the notebook."""
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+
+def _bad_rows(series):
+    """Boolean array, True where ``float(value)`` would fail."""
+    if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_complex_dtype(series.dtype):
+        return np.zeros(len(series), dtype=bool)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+    coerced = pd.to_numeric(series, errors="coerce")
+    bad = (coerced.isna() & series.notna()).to_numpy(dtype=bool, copy=True)
+    candidates = np.flatnonzero(bad)
+    if not len(candidates):
+        return bad
+    values = series.iloc[candidates]
+    is_str = (values.map(type) == str).to_numpy()
+    looks_numeric = values.where(is_str, "").str.fullmatch(_FLOAT_SYNTAX, case=False).to_numpy(dtype=bool)
+    #whatever may still be a float is checked exactly, with the reference function
+    check = candidates[~is_str | looks_numeric]
+    ok = np.fromiter((is_numeric(v) for v in series.iloc[check]), dtype=bool, count=len(check))
+    bad[check[ok]] = False
+    return bad
+
+
+def numeric_report(df, sample=5):
+    """Per column: count, row labels and a sample of the non-numeric values.
+
+    Returns a DataFrame indexed by the columns of ``df`` with ``non_numeric``
+    (count), ``rows`` (index labels of the offending rows) and ``sample``
+    (up to ``sample`` of the offending values).
+    """
+    counts, rows, samples = [], [], []
+    for col in df.columns:
+        series = df[col]
+        bad = _bad_rows(series)
+        counts.append(int(bad.sum()))
+        rows.append(series.index[bad].tolist())
+        samples.append(series[bad].iloc[:sample].tolist())
+    return pd.DataFrame({"non_numeric": counts, "rows": rows, "sample": samples},
+                        index=df.columns)
+
+
+def non_numeric_columns(df):
+    """Columns of ``df`` holding any value ``float()`` cannot convert.
+
+    Same result as ``df.columns[~df.applymap(is_numeric).all(0)]``.
+    """
+    return df.columns[[_bad_rows(df[col]).any() for col in df.columns]]
@@ -0,0 +1,56 @@
+import pandas as pd
+
+from cost_of_living import AggregateIndex, disposable_income
+from cost_of_living.synthetic import generate_cost_of_living
+
+COLUMNS = ["city", "country", "disposable_income"]
+
+
+def snapshot():
+    df = generate_cost_of_living(600, seed=4, n_countries=40)
+    #ties in the ranking, between rows of different countries
+    df.loc[[3, 50, 400], ["x1", "x2", "x36", "x48", "x54"]] = [10.0, 50.0, 100.0, 500.0, 100.0]
+    df.loc[[7, 90], ["x1", "x2", "x36", "x48", "x54"]] = [1.0, 5.0, 10.0, 50.0, 90000.0]
+    df["disposable_income"] = disposable_income(df)
+    return df
+
+
+def assert_rows_equal(got, expected):
+    #the index builds city/country from Python strings, the frame holds objects
+    pd.testing.assert_frame_equal(got, expected, check_dtype=False)
+
+
+def check(index, frame):
+    #the notebook queries on the frame the index stands for, rows in label order
+    frame = frame.sort_index()
+    pd.testing.assert_series_equal(index.value_counts(), frame["country"].value_counts(), check_index_type=False)
+    good = frame[frame["data_quality"] == 1]
+    pd.testing.assert_series_equal(index.value_counts(1), good["country"].value_counts(), check_index_type=False)
+    for k in (1, 5, 20):
+        assert_rows_equal(index.nsmallest(k), frame.nsmallest(k, "disposable_income")[COLUMNS])
+        assert_rows_equal(index.nlargest(k), frame.nlargest(k, "disposable_income")[COLUMNS])
+        assert_rows_equal(index.nlargest(k, data_quality=1), good.nlargest(k, "disposable_income")[COLUMNS])
+
+
+def test_index_matches_frame_queries_after_changes():
+    df = snapshot()
+    index = AggregateIndex().add(df.iloc[:400])
+    check(index, df.iloc[:400])
+
+    index.add(df.iloc[400:])
+    check(index, df)
+
+    #removing the first row of a country moves it back among the countries it ties with
+    first_rows = df.drop_duplicates("country").index[:10]
+    removed = list(dict.fromkeys(list(first_rows) + [3, 7]))
+    index.remove(removed)
+    current = df.drop(index=removed)
+    check(index, current)
+
+    changed = current.loc[[50, 90, 120, 121]].copy()
+    changed["country"] = current.loc[[200, 200, 300, 300], "country"].to_numpy()
+    changed["x54"] = [5.0, 80000.0, 2000.0, 2000.0]
+    changed["disposable_income"] = disposable_income(changed)
+    index.update(changed)
+    current.loc[changed.index] = changed
+    check(index, current)
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from cost_of_living.diff import Signature, diff_csv, diff_frames, index_snapshot
+from cost_of_living.synthetic import generate_cost_of_living
+
+
+def test_duplicate_key_in_one_snapshot(tmp_path):
+    old = generate_cost_of_living(1000, seed=1)
+    old.loc[999, ["city", "country"]] = old.loc[5, ["city", "country"]].to_numpy()
+    new = old.iloc[:999]
+    expected = {"added": 0, "removed": 1, "changed": 0, "unchanged": 999}
+    summary = diff_frames(old, new).summary()
+    assert {name: summary[name] for name in expected} == expected
+
+    old.to_csv(tmp_path / "old.csv", index=False)
+    new.to_csv(tmp_path / "new.csv", index=False)
+    summary = diff_csv(tmp_path / "old.csv", tmp_path / "new.csv", chunksize=300).summary()
+    assert {name: summary[name] for name in expected} == expected
+    assert np.array_equal(Signature.from_csv(tmp_path / "old.csv", chunksize=300).keys,
+                          Signature.from_frame(old).keys)
+
+
+def test_apply_matches_rebuild():
+    old = generate_cost_of_living(2000, seed=7)
+    new = generate_cost_of_living(2000, seed=8)
+    new[["city", "country"]] = old[["city", "country"]]
+    added = generate_cost_of_living(100, seed=9)
+    added["city"] = "New " + added["city"]
+    new = pd.concat([new.iloc[300:], added], ignore_index=True)
+
+    index = index_snapshot(old)
+    diff_frames(old, new).apply(index)
+    rebuilt = index_snapshot(new)
+    assert sorted(index.rows) == sorted(rebuilt.rows)
+    pd.testing.assert_frame_equal(index.nlargest(5), rebuilt.nlargest(5))
+    pd.testing.assert_frame_equal(index.nsmallest(5), rebuilt.nsmallest(5))
@@ -0,0 +1,35 @@
+import pandas as pd
+import pytest
+
+from cost_of_living.joins import FUZZY, KeyIndex
+
+COUNTRIES = pd.DataFrame({"country": ["France", "Germany", "Philippines", "Switzerland", "Austria", "Italy",
+                                      "United States"],
+                          "salary": [3000, 3500, 400, 6000, 3200, 2500, 4500]})
+
+
+@pytest.mark.parametrize("typo, expected", [
+    ("Germny", "Germany"),
+    ("Phillipines", "Philippines"),
+    ("Switzerlnd", "Switzerland"),
+    ("Francee", "France"),
+    ("Itally", "Italy"),
+])
+def test_single_letter_typo_matches(typo, expected):
+    result = KeyIndex(COUNTRIES).join(pd.DataFrame({"country": [typo]}))
+    assert result.method[0] == FUZZY
+    assert COUNTRIES["country"][result.positions[0]] == expected
+
+
+def test_city_typo_matches_within_country():
+    cities = pd.DataFrame({"city": ["Paris", "Lyon", "Paris"], "country": ["France", "France", "United States"],
+                           "index": [1, 2, 3]})
+    index = KeyIndex(cities, on=("city", "country"))
+    frame = pd.DataFrame({"city": ["Pariss", "Pariss"], "country": ["France", "USA"]})
+    assert list(index.join(frame).positions) == [0, 2]
+
+
+def test_unrelated_name_is_left_unmatched():
+    result = KeyIndex(COUNTRIES).join(pd.DataFrame({"country": ["Fiji", "Gabon", "Spain", None]}))
+    assert list(result.positions) == [-1, -1, -1, -1]
+    assert result.stats()["unmatched"] == 4
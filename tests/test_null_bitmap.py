@@ -0,0 +1,26 @@
+import numpy as np
+
+from cost_of_living.null_bitmap import NullBitmap
+from cost_of_living.synthetic import generate_cost_of_living
+
+
+def test_counts_match_isna():
+    df = generate_cost_of_living(3000, seed=3)
+    #more than 64 columns, so bits span two words
+    df["extra"] = np.where(np.arange(len(df)) % 7 == 0, np.nan, 1.0)
+    for i in range(10):
+        df["pad%d" % i] = 1.0
+    bitmap = NullBitmap.from_frame(df)
+    assert bitmap.words.shape[1] == 2
+    assert (bitmap.column_counts() == df.isna().sum()).all()
+
+    groups = df["country"].copy()
+    groups[:20] = None
+    expected = df.isna().groupby(groups).sum().T
+    counts = bitmap.column_counts(groups)
+    assert (counts.to_numpy() == expected[counts.columns].to_numpy()).all()
+
+    single = df[df.isna().sum(axis=1) == 1].isna().sum()
+    impact = bitmap.drop_impact()
+    assert (impact["only_missing"] == single[impact.index]).all()
+    assert (impact["nulls"] == df.isna().sum()[impact.index]).all()
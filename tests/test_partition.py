@@ -0,0 +1,17 @@
+import pandas as pd
+import pytest
+
+from cost_of_living.partition import partition_by_quality
+from cost_of_living.synthetic import generate_cost_of_living
+
+
+@pytest.mark.parametrize("null_policy", ["mask", "drop"])
+def test_partitions_match_notebook_cleaning(null_policy):
+    df = generate_cost_of_living(3000, seed=2)
+    partitions = partition_by_quality(df, null_policy=null_policy)
+    for value in (1, 0):
+        expected = df.loc[df["data_quality"] == value].drop(columns="data_quality")
+        part = partitions[value]
+        assert part.shape_in == (len(expected), df.shape[1])
+        pd.testing.assert_series_equal(part.null_counts, expected.isnull().sum())
+        pd.testing.assert_frame_equal(part.dropna().frame, expected.dropna())
@@ -0,0 +1,18 @@
+import tracemalloc
+
+from cost_of_living.plotting import ReportRenderer
+from cost_of_living.synthetic import generate_cost_of_living
+
+
+def test_memory_tracing_is_opt_in(tmp_path):
+    df = generate_cost_of_living(500, seed=1)
+    with ReportRenderer(tmp_path) as renderer:
+        renderer.scatter(df, "x1", "x54")
+        assert not tracemalloc.is_tracing()
+    assert renderer.records[0]["peak_traced_bytes"] is None
+    assert (tmp_path / "x54_vs_x1.png").exists()
+
+    with ReportRenderer(tmp_path, track_memory=True) as renderer:
+        renderer.scatter(df, "x1", "x54")
+    assert renderer.records[0]["peak_traced_bytes"] > 0
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,10 @@
+from cost_of_living import score_scenarios
+from cost_of_living.synthetic import generate_cost_of_living
+
+
+def test_empty_extremes_have_the_same_columns():
+    df = generate_cost_of_living(200, seed=1)
+    full = score_scenarios(df).extremes(3)
+    empty = score_scenarios(df.iloc[:0]).extremes(3, which="highest")
+    assert list(empty.columns) == list(full.columns)
+    assert empty.empty and empty["label"].empty
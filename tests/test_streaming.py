@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cost_of_living import (DEFAULT_FORMULA, RunningDescribe, disposable_income, find_outliers,
+                            stream_analysis, stream_outliers)
+from cost_of_living.partition import partition_by_quality
+from cost_of_living.synthetic import generate_cost_of_living
+
+N_ROWS = 4500
+
+
+@pytest.fixture(scope="module")
+def snapshot(tmp_path_factory):
+    df = generate_cost_of_living(N_ROWS, seed=5)
+    #a tie at the bottom of the ranking, in two different chunks
+    columns = [col for col in df.columns if col.startswith("x")]
+    df.loc[[10, 3000], columns] = df.loc[[10], columns].fillna(1.0).to_numpy()
+    df.loc[[10, 3000], ["x48", "x54", "data_quality"]] = [9000.0, 100.0, 1]
+    path = tmp_path_factory.mktemp("streaming") / "snapshot.csv"
+    df.to_csv(path, index=False)
+    return path
+
+
+def in_memory(path, quality=1):
+    #the notebook: split by data_quality, drop the column, drop nulls, add disposable income
+    df = pd.read_csv(path)
+    frames = {value: df[df["data_quality"] == value].drop(columns="data_quality")
+              for value in (1, 0)}
+    clean = {value: frame.dropna() for value, frame in frames.items()}
+    good = clean[quality].copy()
+    good["disposable_income"] = disposable_income(good, DEFAULT_FORMULA)
+    return df, frames, clean, good
+
+
+@pytest.mark.parametrize("chunksize", [97, 1000, 4500, 10_000])
+def test_stream_matches_in_memory(snapshot, chunksize):
+    df, frames, clean, good = in_memory(snapshot)
+    result = stream_analysis(snapshot, chunksize=chunksize)
+
+    expected = good[["x54", "disposable_income"]].describe().loc[["count", "mean", "std", "min", "max"]]
+    pd.testing.assert_frame_equal(result.describe_frame(), expected, check_exact=False, rtol=1e-9)
+
+    expected_counts = df["country"].value_counts()
+    pd.testing.assert_series_equal(result.value_counts(), expected_counts, check_names=False)
+    expected_good = clean[1]["country"].value_counts()
+    pd.testing.assert_series_equal(result.value_counts(1), expected_good, check_names=False)
+
+    columns = ["city", "country", "disposable_income"]
+    pd.testing.assert_frame_equal(result.nsmallest(), good.nsmallest(5, "disposable_income")[columns])
+    pd.testing.assert_frame_equal(result.nlargest(), good.nlargest(5, "disposable_income")[columns])
+
+    for value in (1, 0):
+        assert result.rows_in[value] == len(frames[value])
+        assert result.rows_out[value] == len(clean[value])
+
+
+def test_tie_keeps_first_row(snapshot):
+    result = stream_analysis(snapshot, chunksize=1000)
+    assert list(result.nsmallest().index[:2]) == [10, 3000]
+
+
+def test_merged_chunks_match_one_pass(snapshot):
+    whole = stream_analysis(snapshot, chunksize=4500)
+    parts = stream_analysis(snapshot, chunksize=500, nrows=2000)
+    rest = stream_analysis(snapshot, chunksize=500, skiprows=range(1, 2001))
+    merged = parts.merge(rest)
+    pd.testing.assert_frame_equal(merged.describe_frame(), whole.describe_frame(),
+                                  check_exact=False, rtol=1e-9)
+    assert merged.rows_out == whole.rows_out
+
+
+def test_sketched_results_repeat(snapshot):
+    first = stream_analysis(snapshot, chunksize=500, percentiles=(0.25, 0.5, 0.75))
+    second = stream_analysis(snapshot, chunksize=500, percentiles=(0.25, 0.5, 0.75))
+    pd.testing.assert_frame_equal(first.describe_frame(), second.describe_frame())
+
+    flagged, fences = stream_outliers(snapshot, ["x48", "x54"], chunksize=500, sketch_k=20)
+    again, fences_again = stream_outliers(snapshot, ["x48", "x54"], chunksize=500, sketch_k=20)
+    pd.testing.assert_frame_equal(fences, fences_again)
+    pd.testing.assert_frame_equal(flagged, again)
+
+
+def test_merge_needs_sketches_on_both_sides():
+    values = np.arange(1000.0)
+    with_sketch = RunningDescribe((0.5,)).update(values)
+    without = RunningDescribe().update(values)
+    with pytest.raises(ValueError):
+        with_sketch.merge(without)
+    with pytest.raises(ValueError):
+        RunningDescribe().update(values).merge(RunningDescribe((0.5,)).update(values))
+
+    #an empty side takes on the other's percentiles
+    merged = RunningDescribe().merge(with_sketch)
+    assert merged.count == 1000
+    assert merged.to_series()["50%"] == with_sketch.to_series()["50%"]
+    assert RunningDescribe((0.5,)).merge(without).to_series().index.tolist() == [
+        "count", "mean", "std", "min", "max"]
+
+
+def test_streamed_robust_z_matches_in_memory(snapshot):
+    good = partition_by_quality(pd.read_csv(snapshot))[1].dropna().frame
+    columns = ["x48", "x54"]
+    values = good[columns].to_numpy()
+    median = np.median(values, axis=0)
+    mad = np.median(np.abs(values - median), axis=0)
+
+    flagged, centres = stream_outliers(snapshot, columns, chunksize=500, method="robust_z")
+    #within the sketch's rank error of about 1%
+    for j, col in enumerate(columns):
+        for row, exact in (("median", values[:, j]), ("mad", np.abs(values[:, j] - median[j]))):
+            rank = np.mean(exact <= centres.loc[row, col])
+            assert abs(rank - 0.5) < 0.02
+    assert np.allclose(centres.loc["median"], median, rtol=0.05)
+    assert np.allclose(centres.loc["mad"], mad, rtol=0.05)
+
+    expected = find_outliers(good, columns, method="robust_z")
+    streamed = set(zip(flagged["row"], flagged["column"]))
+    exact = set(zip(expected["row"], expected["column"]))
+    #only values near the threshold can land on different sides of it
+    assert len(streamed ^ exact) <= 0.05 * len(exact)
+    assert streamed
+
+
+def test_country_z_is_not_streamed(snapshot):
+    with pytest.raises(ValueError, match="robust_z"):
+        stream_outliers(snapshot, ["x48"], method="country_z")
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+from cost_of_living.validation import is_numeric, non_numeric_columns
+
+
+def reference(df):
+    #section 2.2.1 of the notebook, one float() call per cell
+    return df.columns[~df.map(is_numeric).all(axis=0)]
+
+
+def test_non_numeric_columns_matches_per_cell_check():
+    df = pd.DataFrame({
+        "float": [1.5, np.nan, 3.0, 4.0],
+        "int": [1, 2, 3, 4],
+        "numeric_text": ["1", " 2.5 ", "1e3", "1_000"],
+        "special_text": ["nan", "inf", "-Infinity", "+3."],
+        "word": ["1", "2", "three", "4"],
+        "empty": ["1", "", "2", "3"],
+        "none": ["1", None, "2", "3"],
+        "mixed": [1, "2", 3.5, "x"],
+        "bool": [True, False, True, True],
+        "category": pd.Categorical(["1", "2", "x", "1"]),
+    })
+    assert list(non_numeric_columns(df)) == list(reference(df))
+    assert list(reference(df)) == ["word", "empty", "mixed", "category"]